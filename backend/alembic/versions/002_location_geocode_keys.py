@@ -0,0 +1,32 @@
+"""Location geocode store keys - normalized name, rounded coordinates, geocoded_at
+
+Revision ID: 002
+Revises: 001
+Create Date: 2025-01-20 00:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "002"
+down_revision: Union[str, None] = "001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("locations", sa.Column("normalized_name", sa.String(100), nullable=True))
+    op.add_column("locations", sa.Column("coord_key", sa.String(24), nullable=True))
+    op.add_column("locations", sa.Column("geocoded_at", sa.DateTime(timezone=True), nullable=True))
+    # One geocode row per key; NULLs (watchlist rows, the other key kind) never collide
+    op.create_index("ix_locations_normalized_name", "locations", ["normalized_name"], unique=True)
+    op.create_index("ix_locations_coord_key", "locations", ["coord_key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_locations_coord_key", table_name="locations")
+    op.drop_index("ix_locations_normalized_name", table_name="locations")
+    op.drop_column("locations", "geocoded_at")
+    op.drop_column("locations", "coord_key")
+    op.drop_column("locations", "normalized_name")
@@ -1,31 +1,34 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.dependencies import get_current_user_id
 from app.db.session import get_db
 from app.schemas.watchlist import AddWatchlistRequest, WatchlistItemResponse, WatchlistResponse
 from app.services.watchlist_service import WatchlistService
+from app.utils.media import negotiated
 
 router = APIRouter(prefix="/watchlist", tags=["Watchlist"])
 
 
 @router.get("", response_model=WatchlistResponse)
 async def get_watchlist(
+    request: Request,
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     service = WatchlistService(db)
-    return await service.get_watchlist(user_id)
+    return negotiated(request, await service.get_watchlist(user_id))
 
 
 @router.post("", response_model=WatchlistItemResponse, status_code=status.HTTP_201_CREATED)
 async def add_to_watchlist(
+    request: Request,
     data: AddWatchlistRequest,
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     service = WatchlistService(db)
-    return await service.add_location(user_id, data)
+    return negotiated(request, await service.add_location(user_id, data), status_code=status.HTTP_201_CREATED)
 
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,29 +1,115 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
 
+from app.core.config import settings
 from app.core.dependencies import get_current_user_id
+from app.core.exceptions import ValidationError
 from app.schemas.weather import CurrentWeatherResponse, ForecastResponse
-from app.services.weather_service import WeatherService
+from app.services.weather_service import (
+    CURRENT_SELECTABLE,
+    FORECAST_SELECTABLE,
+    WeatherResult,
+    WeatherService,
+)
+from app.utils.compression import negotiate_encoding
+from app.utils.conditional import base_etag, cache_headers, is_not_modified, variant_etag
+from app.utils.media import JSON, negotiate_media_type
+from app.utils.projection import parse_fields
 
 router = APIRouter(prefix="/weather", tags=["Weather"])
 
+COLUMNAR_MEDIA_TYPE = "application/vnd.weather.columnar+json"
+DELTA_MEDIA_TYPE = "application/vnd.weather.delta+json"
+
+
+def _conditional(
+    request: Request, result: WeatherResult, json_media_type: str = JSON, media_type: str | None = None
+) -> Response:
+    """Answer 304 when the client's ETag / Last-Modified is current, else send the cached bytes
+    in the media type (JSON, MessagePack, CBOR) and content coding the client accepts. Pass
+    `media_type` when the endpoint has already negotiated it.
+
+    The bytes were encoded (and compressed) once per cached result, so response_model
+    validation and serialization are skipped here; the declared response_model still documents
+    the schema.
+    """
+    if media_type is None:
+        media_type = negotiate_media_type(request.headers.get("accept"))
+    variants = result.variants_for(media_type)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), variants)
+    etag = variant_etag(result.etag, encoding, form=None if media_type == JSON else media_type)
+    headers = cache_headers(etag, result.last_modified, result.max_age, vary="Accept, Accept-Encoding")
+    if is_not_modified(request.headers, etag, result.last_modified):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    content_type = json_media_type if media_type == JSON else media_type
+    return Response(content=variants[encoding], media_type=content_type, headers=headers)
+
 
 @router.get("/current", response_model=CurrentWeatherResponse)
 async def get_current_weather(
+    request: Request,
     city: str | None = Query(None, min_length=1, max_length=100),
     lat: float | None = Query(None, ge=-90, le=90),
     lon: float | None = Query(None, ge=-180, le=180),
+    fields: str | None = Query(None, max_length=500),
     _user_id: str = Depends(get_current_user_id),
 ):
+    """Current conditions. `fields=temp,icon,description` returns only those `data` fields."""
+    selection = parse_fields(fields, CURRENT_SELECTABLE, default_parent="data") if fields else None
     service = WeatherService()
-    return await service.get_current(city=city, lat=lat, lon=lon)
+    result = await service.get_current_result(city=city, lat=lat, lon=lon, fields=selection)
+    return _conditional(request, result)
 
 
 @router.get("/forecast", response_model=ForecastResponse)
 async def get_forecast(
+    request: Request,
     city: str | None = Query(None, min_length=1, max_length=100),
     lat: float | None = Query(None, ge=-90, le=90),
     lon: float | None = Query(None, ge=-180, le=180),
+    days: int = Query(5, ge=1, le=settings.FORECAST_MAX_DAYS),
+    hours: int = Query(48, ge=1, le=settings.FORECAST_HOURLY_HORIZON_HOURS),
+    layout: str = Query("rows", alias="format", pattern="^(rows|columnar)$"),
+    fields: str | None = Query(None, max_length=500),
+    since: str | None = Query(None, max_length=100),
     _user_id: str = Depends(get_current_user_id),
 ):
+    """Daily/hourly forecast and alerts.
+
+    `format=columnar` (or `Accept: application/vnd.weather.columnar+json`) returns `daily` and
+    `hourly` as parallel arrays per field, with description/icon replaced by a `condition`
+    index into a shared `conditions` list. `fields=hourly.temp,hourly.icon,city_name` returns
+    only the selected fields (a bare `hourly` selects every hourly field).
+
+    `since=<etag>` (the ETag of a forecast the client holds, or the `to` of its last delta)
+    returns only the rows added, changed or removed since then, as
+    `application/vnd.weather.delta+json`. When that version is no longer kept the full forecast
+    is returned instead, with its usual content type.
+    """
+    if settings.FORECAST_DAILY_FROM_HOURLY and days > settings.FORECAST_HOURLY_HORIZON_HOURS // 24:
+        # Daily rows come from the hourly series, which ends before FORECAST_MAX_DAYS
+        raise ValidationError(
+            detail=f"days must be at most {settings.FORECAST_HOURLY_HORIZON_HOURS // 24} for this deployment"
+        )
+    selection = parse_fields(fields, FORECAST_SELECTABLE) if fields else None
+    media_type = negotiate_media_type(request.headers.get("accept"), extra=(COLUMNAR_MEDIA_TYPE,))
+    columnar = layout == "columnar" or media_type == COLUMNAR_MEDIA_TYPE
+    if media_type == COLUMNAR_MEDIA_TYPE:
+        media_type = JSON  # columnar is a JSON layout
     service = WeatherService()
-    return await service.get_forecast(city=city, lat=lat, lon=lon)
+    if since:
+        if columnar:
+            raise ValidationError(detail="since is only supported for the rows format")
+        result, is_delta = await service.get_forecast_delta(
+            base_etag(since), city=city, lat=lat, lon=lon, days=days, hours=hours, fields=selection
+        )
+        return _conditional(
+            request, result, json_media_type=DELTA_MEDIA_TYPE if is_delta else JSON, media_type=media_type
+        )
+    result = await service.get_forecast_result(
+        city=city, lat=lat, lon=lon, days=days, hours=hours, columnar=columnar, fields=selection
+    )
+    return _conditional(
+        request, result, json_media_type=COLUMNAR_MEDIA_TYPE if columnar else JSON, media_type=media_type
+    )
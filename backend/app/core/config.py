@@ -31,6 +31,98 @@ class Settings(BaseSettings):
     API_TIMEOUT_SECONDS: int = 5
     API_MAX_RETRIES: int = 3
 
+    # Upstream mode: "live" (network, mock on failure), "mock" (generators only, no network),
+    # "record" (live + archive every response) or "replay" (serve archived responses only)
+    UPSTREAM_MODE: str = "live"
+    UPSTREAM_ARCHIVE_DIR: str = "upstream_archive"
+    UPSTREAM_REPLAY_LATENCY: bool = False
+
+    # Upstream HTTP connection pool (shared keep-alive clients)
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = True
+
+    # WeatherBit upstream rate limit (request starts/sec, burst, concurrent requests)
+    WEATHERBIT_RATE_PER_SECOND: float = 2.0
+    WEATHERBIT_RATE_BURST: int = 4
+    WEATHERBIT_MAX_IN_FLIGHT: int = 10
+
+    # Nominatim usage policy: at most 1 request/s, one at a time; excess lookups queue for up to
+    # NOMINATIM_MAX_QUEUE_SECONDS before giving up
+    NOMINATIM_RATE_PER_SECOND: float = 1.0
+    NOMINATIM_MAX_QUEUE_SECONDS: float = 10.0
+    NOMINATIM_TIMEOUT_SECONDS: float = 5.0
+    NOMINATIM_USER_AGENT: str = "WeatherMonitor/1.0"
+
+    # Circuit breakers around WeatherBit / Nominatim
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RECOVERY_SECONDS: float = 30.0
+    CIRCUIT_HALF_OPEN_PROBES: int = 1
+
+    # Cache backend: "memory" (per process) or "sqlite" (one file shared by all workers on a host)
+    CACHE_BACKEND: str = "memory"
+    CACHE_SQLITE_PATH: str = "/tmp/weather-cache/cache.sqlite3"
+    # Geocodes: places found are kept for GEOCODE_CACHE_TTL_SECONDS, "no such place" answers for
+    # GEOCODE_NEGATIVE_TTL_SECONDS; failed lookups (errors, timeouts) are never cached
+    GEOCODE_CACHE_MAX_ENTRIES: int = 10000
+    GEOCODE_CACHE_MAX_BYTES: int = 4 * 1024 * 1024
+    GEOCODE_CACHE_TTL_SECONDS: float = 30 * 24 * 3600
+    GEOCODE_NEGATIVE_TTL_SECONDS: float = 3600.0
+    # Write geocodes through to the locations table so all workers and restarts share them
+    GEOCODE_DB_ENABLED: bool = True
+    # Offline gazetteer (needs geonamescache): GeoNames cities of at least GAZETTEER_MIN_POPULATION
+    # (500, 1000, 5000 or 15000) resolve by name in-process, before any geocoding request;
+    # coordinates within GAZETTEER_REVERSE_RADIUS_KM of one reverse-geocode to it (0 disables)
+    GAZETTEER_ENABLED: bool = True
+    GAZETTEER_MIN_POPULATION: int = 15000
+    GAZETTEER_REVERSE_RADIUS_KM: float = 10.0
+
+    # Upstream response cache bounds
+    WEATHER_CACHE_MAX_ENTRIES: int = 5000
+    WEATHER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_SWEEP_INTERVAL_SECONDS: float = 60.0
+    # Past the 5-minute TTL: serve stale + refresh in background, or serve stale when upstream fails
+    CACHE_STALE_WHILE_REVALIDATE_SECONDS: float = 600.0
+    CACHE_STALE_IF_ERROR_SECONDS: float = 3600.0
+
+    # Forecasts are fetched and cached at the full horizon once per location, then sliced
+    FORECAST_MAX_DAYS: int = 16
+    FORECAST_HOURLY_HORIZON_HOURS: int = 120
+    # Derive daily forecasts from the hourly fetch instead of calling /forecast/daily
+    FORECAST_DAILY_FROM_HOURLY: bool = False
+
+    # Encoded weather responses shared by identical requests. Responses are kept until their
+    # upstream data expires; ones built from stale data only for WEATHER_RESULT_MEMO_SECONDS
+    # (0 disables the cache entirely)
+    WEATHER_RESULT_MEMO_SECONDS: float = 2.0
+    WEATHER_RESULT_MEMO_MAX_ENTRIES: int = 2000
+    WEATHER_RESULT_MEMO_MAX_BYTES: int = 32 * 1024 * 1024
+    # Cached responses are also stored gzip/brotli-compressed (once, at build time)
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 9
+    RESPONSE_BROTLI_QUALITY: int = 9
+    # Recent forecast versions kept per location/query so polling clients can ask for a delta
+    # (`since=<etag>`) instead of the full series (0 disables deltas)
+    FORECAST_DELTA_VERSIONS: int = 6
+    FORECAST_DELTA_HISTORY_SECONDS: float = 3600.0
+    FORECAST_DELTA_MAX_BYTES: int = 16 * 1024 * 1024
+
+    # Background refresh of watchlisted locations ahead of cache expiry
+    PREFETCH_ENABLED: bool = True
+    PREFETCH_INTERVAL_SECONDS: float = 60.0
+    PREFETCH_LEAD_SECONDS: float = 90.0
+    PREFETCH_JITTER_SECONDS: float = 10.0
+    PREFETCH_MAX_LOCATIONS: int = 50
+    PREFETCH_MAX_BACKOFF_SECONDS: float = 900.0
+    PREFETCH_ACCESS_WEIGHT: float = 0.5
+    PREFETCH_ACCESS_HALF_LIFE_SECONDS: float = 1800.0
+
+    # Coordinate quantization for upstream calls/cache keys: "grid", "geohash" or "none"
+    COORD_QUANTIZATION: str = "grid"
+    COORD_GRID_DEGREES: float = 0.02  # ~2 km cells
+    COORD_GEOHASH_PRECISION: int = 5  # ~4.9 km x 4.9 km cells
+
     # CORS
     CORS_ORIGINS: list[str] = ["http://localhost:3000", "http://localhost:5173","http://127.0.0.1:3000","https://weatherr-task.vercel.app"]
 
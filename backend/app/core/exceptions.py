@@ -37,6 +37,23 @@ class ExternalAPIError(AppException):
         super().__init__(status_code=status.HTTP_502_BAD_GATEWAY, detail=detail)
 
 
+class CircuitOpenError(ExternalAPIError):
+    """Raised without contacting the upstream while its circuit breaker is open."""
+
+    def __init__(self, detail: str = "Upstream temporarily unavailable"):
+        super().__init__(detail=detail)
+        self.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+class GeocodingUnavailableError(ExternalAPIError):
+    """A geocoding lookup failed (upstream error, open circuit, queue timeout), as opposed to
+    finding no such place."""
+
+    def __init__(self, detail: str = "Geocoding temporarily unavailable"):
+        super().__init__(detail=detail)
+        self.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+
 class ValidationError(AppException):
     def __init__(self, detail: str = "Validation error"):
         super().__init__(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
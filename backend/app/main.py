@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 import structlog
@@ -8,6 +9,10 @@ from app.api.v1.router import api_router
 from app.core.config import settings
 from app.db.base import Base
 from app.db.session import engine
+from app.services import geocoding, weather_service
+from app.services.gazetteer import gazetteer
+from app.services.prefetch_scheduler import prefetch_scheduler
+from app.services.weather_client import weather_client
 
 # Import all models so Base.metadata registers every table
 from app.models.user import User  # noqa: F401
@@ -34,8 +39,21 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     logger.info("database_tables_created")
+    await weather_client.start()
+    await geocoding.nominatim.start()
+    # Build the offline gazetteer off the event loop; names fall through to Nominatim until it's ready
+    gazetteer_load = asyncio.create_task(asyncio.to_thread(gazetteer.load))
+    if settings.PREFETCH_ENABLED and settings.UPSTREAM_MODE != "mock":
+        prefetch_scheduler.start()
     yield
-    # Shutdown: dispose engine
+    # Shutdown: stop prefetching, close pooled upstream connections, then dispose engine
+    await prefetch_scheduler.stop()
+    try:
+        await gazetteer_load
+    except Exception as e:  # a failed build must not keep connections and the engine open
+        logger.warning("gazetteer_load_error", error=str(e))
+    await weather_client.aclose()
+    await geocoding.nominatim.aclose()
     await engine.dispose()
     logger.info("database_engine_disposed")
 
@@ -66,6 +84,22 @@ def create_app() -> FastAPI:
     async def health_check():
         return {"status": "healthy", "version": settings.APP_VERSION}
 
+    @app.get("/health/upstream", tags=["Health"])
+    async def upstream_health():
+        # Shared (SQLite) caches count their rows with a blocking query
+        weather_cache, geocode_cache = await asyncio.gather(
+            asyncio.to_thread(weather_client.cache_stats), asyncio.to_thread(geocoding.cache_stats)
+        )
+        return {
+            "weather_cache": weather_cache,
+            "geocode_cache": geocode_cache,
+            "result_memo": weather_service.result_memo_stats(),
+            "circuits": {
+                "weatherbit": weather_client.breaker.snapshot(),
+                "nominatim": geocoding.breaker.snapshot(),
+            },
+        }
+
     return app
 
 
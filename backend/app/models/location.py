@@ -17,6 +17,10 @@ class Location(Base):
     country_code: Mapped[str] = mapped_column(String(10), nullable=True)
     latitude: Mapped[float] = mapped_column(Float, nullable=True)
     longitude: Mapped[float] = mapped_column(Float, nullable=True)
+    # Geocode store lookup keys; a row holding a geocoder answer (geocoded_at) has exactly one
+    normalized_name: Mapped[str | None] = mapped_column(String(100), nullable=True, unique=True, index=True)
+    coord_key: Mapped[str | None] = mapped_column(String(24), nullable=True, unique=True, index=True)
+    geocoded_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
@@ -1,7 +1,11 @@
-from sqlalchemy import select
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.location import Location
+from app.models.watchlist import WatchlistItem
 
 
 class LocationRepository:
@@ -9,10 +13,65 @@ class LocationRepository:
         self._db = db
 
     async def get_by_city(self, city_name: str) -> Location | None:
-        stmt = select(Location).where(Location.city_name == city_name)
+        """Watchlist location by name. Geocode rows share the table but are never returned, so a
+        geocode refresh can't rewrite a location that watchlist items point at."""
+        stmt = select(Location).where(Location.city_name == city_name, Location.geocoded_at.is_(None))
+        result = await self._db.execute(stmt)
+        return result.scalars().first()
+
+    async def get_most_watched(self, limit: int) -> list[tuple[Location, int]]:
+        """Watchlisted locations with their watcher counts, most watched first."""
+        watchers = func.count(WatchlistItem.id).label("watchers")
+        stmt = (
+            select(Location, watchers)
+            .join(WatchlistItem, WatchlistItem.location_id == Location.id)
+            .group_by(Location.id)
+            .order_by(watchers.desc())
+            .limit(limit)
+        )
+        result = await self._db.execute(stmt)
+        return [(location, count) for location, count in result.all()]
+
+    async def get_geocoded_by_name(self, normalized_name: str) -> Location | None:
+        stmt = (
+            select(Location)
+            .where(Location.normalized_name == normalized_name, Location.geocoded_at.is_not(None))
+        )
         result = await self._db.execute(stmt)
         return result.scalars().first()
 
+    async def get_geocoded_by_coords(self, coord_key: str) -> Location | None:
+        stmt = (
+            select(Location)
+            .where(Location.coord_key == coord_key, Location.geocoded_at.is_not(None))
+        )
+        result = await self._db.execute(stmt)
+        return result.scalars().first()
+
+    async def save_geocode(
+        self, city_name: str, country_code: str | None, latitude: float | None,
+        longitude: float | None, geocoded_at: datetime,
+        normalized_name: str | None = None, coord_key: str | None = None,
+    ) -> None:
+        """Insert or refresh the geocode row for one key: a normalized name or a rounded-coordinate
+        key. A single upsert, so concurrent writers of the same key can't add a second row."""
+        key = "normalized_name" if normalized_name is not None else "coord_key"
+        dialect = postgresql if self._db.get_bind().dialect.name == "postgresql" else sqlite
+        stmt = dialect.insert(Location).values(
+            city_name=city_name,
+            country_code=country_code,
+            latitude=latitude,
+            longitude=longitude,
+            normalized_name=normalized_name,
+            coord_key=coord_key,
+            geocoded_at=geocoded_at,
+        )
+        answer = ("city_name", "country_code", "latitude", "longitude", "geocoded_at")
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key], set_={column: stmt.excluded[column] for column in answer}
+        )
+        await self._db.execute(stmt)
+
     async def create(self, location: Location) -> Location:
         self._db.add(location)
         await self._db.flush()
@@ -0,0 +1,171 @@
+"""Offline city gazetteer: GeoNames cities resolved in-process, before any geocoding request.
+
+Built from the optional `geonamescache` package (GeoNames cities at or above
+GAZETTEER_MIN_POPULATION; data CC-BY GeoNames). Names and Latin-script alternate names are
+folded (case, accents, punctuation) into one sorted key list searched with bisect, with city
+attributes in parallel arrays, so the index stays a few MB instead of the source's dicts.
+
+A key shared by several places resolves to the best match: a primary name beats an alias, then
+the larger population wins. Names of countries, US states, continents and a few well-known
+regions go to the geocoder, whether GeoNames has them as a small town's name ("Florida",
+Cuba) or alias ("Chile", Turkey); only a city-state's capital keeps its country's name.
+
+A k-d tree over the same cities answers radius queries, so reverse geocoding near a known city
+needs no request either. Loading takes a second or two, so the app builds it off the event loop
+at startup; until then lookups miss and callers fall through to the geocoder.
+"""
+
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Mapping
+
+import structlog
+
+from app.core.config import settings
+from app.utils.spatial import SpatialIndex
+
+try:
+    import geonamescache
+except ImportError:  # optional: without it only the geocoder resolves cities
+    geonamescache = None
+
+logger = structlog.get_logger()
+
+# Apostrophes vanish ("St. John's" ~ "st johns"); other separators become spaces
+_PUNCTUATION = str.maketrans({"'": "", "’": "", **{c: " " for c in "-.,()/"}})
+
+# First-level regions and islands that are better known than a city of the same name
+_REGIONS = (
+    "Bali", "Cornwall", "Durango", "Essex", "Goa", "Holland", "Kent", "Okinawa", "Ontario",
+    "Paraná", "Quebec", "Santa Catarina", "Tuscany", "Victoria", "Zanzibar",
+)
+
+
+def fold(name: str) -> str:
+    """Lookup key: case- and accent-insensitive, punctuation ignored, whitespace collapsed."""
+    folded = name.casefold()
+    if not folded.isascii():
+        decomposed = unicodedata.normalize("NFKD", folded)
+        folded = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(folded.translate(_PUNCTUATION).split())
+
+
+class Gazetteer:
+    def __init__(self):
+        self._keys: list[str] = []
+        self._refs = array("l")  # key position -> city index
+        self._names: list[str] = []
+        self._countries: list[str] = []
+        self._lat = array("d")
+        self._lon = array("d")
+        self._population = array("l")
+        self._spatial: SpatialIndex | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cities": len(self),
+            "keys": len(self._keys),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def build(self, rows: Iterable[dict], regions: Mapping[str, str | None] | None = None) -> "Gazetteer":
+        """Index GeoNames-shaped rows (name, countrycode, latitude, longitude, population,
+        alternatenames). Replaces any previous contents.
+
+        `regions` maps names of places that are not cities (countries, states) to the one city
+        allowed to keep that name, such as a city-state's capital, or None; every other region
+        name, primary or alias, is left to the geocoder."""
+        names, countries, lat, lon, population = [], [], array("d"), array("d"), array("l")
+        best: dict[str, tuple[int, int, int]] = {}  # key -> (alias?, -population, city index)
+        for row in rows:
+            index = len(names)
+            names.append(row["name"])
+            countries.append(row.get("countrycode") or "XX")
+            lat.append(float(row["latitude"]))
+            lon.append(float(row["longitude"]))
+            population.append(int(row.get("population") or 0))
+            # Aliases in Latin script only (up to Latin Extended-B); other scripts never fold to ASCII
+            aliases = [(alias, 1) for alias in row.get("alternatenames") or () if alias and max(alias) < "\u0250"]
+            for name, is_alias in [(row["name"], 0), *aliases]:
+                key = fold(name)
+                if not key or (is_alias and not key.isascii()):
+                    continue
+                rank = (is_alias, -population[index], index)
+                if key not in best or rank < best[key]:
+                    best[key] = rank
+        for region, keeper in (regions or {}).items():
+            key = fold(region)
+            if key in best and (keeper is None or fold(names[best[key][2]]) != fold(keeper)):
+                del best[key]
+        keys = sorted(best)
+        self._refs = array("l", (best[k][2] for k in keys))
+        self._names, self._countries = names, countries
+        self._lat, self._lon, self._population = lat, lon, population
+        self._spatial = SpatialIndex(zip(lat, lon))
+        # Keys last: a lookup racing a background build sees either no index or the whole one
+        self._keys = keys
+        return self
+
+    def lookup(self, name: str) -> dict | None:
+        """The city a name refers to, shaped like a geocoding result, or None."""
+        if not self._keys:
+            return None
+        key = fold(name)
+        pos = bisect_left(self._keys, key)
+        if pos == len(self._keys) or self._keys[pos] != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        i = self._refs[pos]
+        return {"city": self._names[i], "country": self._countries[i], "lat": self._lat[i], "lon": self._lon[i]}
+
+    def nearest(self, lat: float, lon: float, max_km: float) -> dict | None:
+        """The city a point belongs to, shaped like a reverse-geocoding result, or None when no
+        city lies within max_km. GeoNames also lists districts as cities (Times Square), so the
+        most populous place in range wins over the closest one."""
+        if self._spatial is None:
+            return None
+        found = self._spatial.within(lat, lon, max_km)
+        if not found:
+            return None
+        i, _ = max(found, key=lambda item: (self._population[item[0]], -item[1]))
+        return {"city": self._names[i], "country": self._countries[i]}
+
+    def load(self) -> bool:
+        """Build from geonamescache when enabled and installed; returns whether it is loaded."""
+        if not settings.GAZETTEER_ENABLED or geonamescache is None:
+            return False
+        started = time.monotonic()
+        try:
+            source = geonamescache.GeonamesCache(min_city_population=settings.GAZETTEER_MIN_POPULATION)
+            cities = source.get_cities()
+            regions: dict[str, str | None] = dict.fromkeys(_REGIONS)
+            regions.update({c["name"]: c.get("capital") for c in source.get_countries().values()})
+            regions.update(dict.fromkeys(s["name"] for s in source.get_us_states().values()))
+            regions.update(dict.fromkeys(c["name"] for c in source.get_continents().values()))
+        except (ValueError, OSError) as e:  # unsupported threshold, unreadable data file
+            logger.warning("gazetteer_load_failed", error=str(e))
+            return False
+        self.build(cities.values(), regions)
+        logger.info(
+            "gazetteer_loaded", cities=len(self), keys=len(self._keys),
+            seconds=round(time.monotonic() - started, 2),
+        )
+        return True
+
+
+gazetteer = Gazetteer()
@@ -0,0 +1,110 @@
+"""Write-through geocode store in the locations table, shared by every worker and pod.
+
+Sits between the in-process geocode cache and Nominatim: a lookup that misses memory checks
+here before going to the network, and every Nominatim answer is written back. Rows hold a
+geocoder answer only when `geocoded_at` is set; watchlist-created rows are never used as one.
+Only places that exist are stored ("no such place" stays a short-lived in-memory answer).
+"""
+
+import time
+from datetime import datetime, timezone
+
+import structlog
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import async_session_factory
+from app.models.location import Location
+from app.repositories.location_repository import LocationRepository
+
+logger = structlog.get_logger()
+
+# Connection failures surface as OSError from the driver before SQLAlchemy wraps them
+_DB_ERRORS = (SQLAlchemyError, OSError)
+
+
+class GeocodeStore:
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession] = async_session_factory):
+        self._session_factory = session_factory
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.GEOCODE_DB_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "errors": self.errors,
+        }
+
+    async def _find(self, repo: LocationRepository, kind: str, value: str) -> Location | None:
+        if kind == "city":
+            return await repo.get_geocoded_by_name(value)
+        return await repo.get_geocoded_by_coords(value)
+
+    async def get(self, kind: str, value: str) -> tuple[dict, float] | None:
+        """Stored answer for a "city" (normalized name) or "coords" (rounded "lat,lon") key, with
+        its remaining freshness in seconds. Answers older than GEOCODE_CACHE_TTL_SECONDS miss."""
+        if not settings.GEOCODE_DB_ENABLED:
+            return None
+        try:
+            async with self._session_factory() as session:
+                row = await self._find(LocationRepository(session), kind, value)
+        except _DB_ERRORS as e:
+            self.errors += 1
+            logger.warning("geocode_store_read_failed", kind=kind, value=value, error=str(e))
+            return None
+        remaining = None
+        if row is not None:
+            remaining = settings.GEOCODE_CACHE_TTL_SECONDS - (time.time() - _timestamp(row.geocoded_at))
+        if remaining is None or remaining <= 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        result = {"city": row.city_name, "country": row.country_code}
+        if kind == "city":
+            result.update(lat=row.latitude, lon=row.longitude)
+        return result, remaining
+
+    async def put(self, kind: str, value: str, result: dict, lat: float | None = None, lon: float | None = None) -> None:
+        """Write a Nominatim answer through. Forward answers also refresh the coordinate key of the
+        place they found, so reverse lookups near a known city are served from the store too."""
+        if not settings.GEOCODE_DB_ENABLED:
+            return
+        if kind == "city":
+            lat, lon = result["lat"], result["lon"]
+        answer = {
+            "city_name": result["city"][:100],
+            "country_code": result.get("country"),
+            "latitude": lat,
+            "longitude": lon,
+            "geocoded_at": datetime.now(timezone.utc),
+        }
+        try:
+            async with self._session_factory() as session:
+                repo = LocationRepository(session)
+                if kind == "city":
+                    await repo.save_geocode(**answer, normalized_name=value)
+                await repo.save_geocode(**answer, coord_key=value if kind == "coords" else coord_key(lat, lon))
+                await session.commit()
+        except _DB_ERRORS as e:
+            self.errors += 1
+            logger.warning("geocode_store_write_failed", kind=kind, value=value, error=str(e))
+
+
+def coord_key(lat: float, lon: float) -> str:
+    return f"{lat:.2f},{lon:.2f}"
+
+
+def _timestamp(value: datetime) -> float:
+    # SQLite hands back naive datetimes; everything is stored in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+geocode_store = GeocodeStore()
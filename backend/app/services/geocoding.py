@@ -1,77 +1,283 @@
 """Geocoding service using Nominatim (OpenStreetMap) - no API key required."""
 
+import asyncio
+import time
+from collections.abc import Callable
+
 import httpx
 import structlog
 
+from app.core.config import settings
+from app.core.exceptions import GeocodingUnavailableError
+from app.services.gazetteer import gazetteer
+from app.services.geocode_store import GeocodeStore, coord_key, geocode_store
+from app.services.upstream_archive import upstream_archive
+from app.utils.cache import create_cache_backend
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.http import create_pooled_client
+from app.utils.rate_limit import UpstreamLimiter
+
 logger = structlog.get_logger()
 
 NOMINATIM_URL = "https://nominatim.openstreetmap.org"
-HEADERS = {"User-Agent": "WeatherMonitor/1.0"}
 
-_cache: dict[str, dict | None] = {}
+breaker = CircuitBreaker(
+    "nominatim",
+    failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+    recovery_timeout=settings.CIRCUIT_RECOVERY_SECONDS,
+    half_open_max_calls=settings.CIRCUIT_HALF_OPEN_PROBES,
+)
+
+
+def _place_name(addr: dict, *fallback_fields: str) -> str | None:
+    for field in ("city", "town", "village", "municipality", *fallback_fields):
+        if addr.get(field):
+            return addr[field]
+    return None
+
+
+def _parse_search(data: list, city: str) -> dict | None:
+    if not data:
+        return None
+    r = data[0]
+    addr = r.get("address", {})
+    return {
+        "city": _place_name(addr) or city.title(),
+        "country": addr.get("country_code", "xx").upper(),
+        "lat": float(r["lat"]),
+        "lon": float(r["lon"]),
+    }
+
+
+def _parse_reverse(data: dict) -> dict:
+    addr = data.get("address", {})
+    return {
+        "city": _place_name(addr, "county") or "Unknown",
+        "country": addr.get("country_code", "xx").upper(),
+    }
+
+
+class NominatimClient:
+    """Nominatim client following its usage policy: one pooled keep-alive connection, at most
+    NOMINATIM_RATE_PER_SECOND request starts with one request in flight, and per-key
+    single-flight so concurrent lookups of the same place share one request (and its outcome).
+
+    Lookups over the limit queue in arrival order; one that waits longer than
+    NOMINATIM_MAX_QUEUE_SECONDS gives up without caching anything.
+
+    Results share one bounded LRU cache: places found live for GEOCODE_CACHE_TTL_SECONDS,
+    "no such place" (a 200 with no match) for GEOCODE_NEGATIVE_TTL_SECONDS. Failures raise
+    GeocodingUnavailableError and are not cached, so a transient outage never turns a real
+    city into "not found". Below the memory cache, places found are written through to the
+    database (GeocodeStore), which is checked before Nominatim on a memory miss.
+    """
+
+    def __init__(self, store: GeocodeStore | None = None):
+        self._store = store or geocode_store
+        self._headers = {"User-Agent": settings.NOMINATIM_USER_AGENT}
+        self._timeout = httpx.Timeout(settings.NOMINATIM_TIMEOUT_SECONDS)
+        self._cache = create_cache_backend(
+            "geocode",
+            ttl=settings.GEOCODE_CACHE_TTL_SECONDS,
+            max_entries=settings.GEOCODE_CACHE_MAX_ENTRIES,
+            max_bytes=settings.GEOCODE_CACHE_MAX_BYTES,
+        )
+        # Lookups in progress, awaited by every concurrent caller for the same key (single-flight)
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.negative_hits = 0
+        self.errors = 0
+        self._limiter = UpstreamLimiter(rate=settings.NOMINATIM_RATE_PER_SECOND, burst=1, max_in_flight=1)
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared pooled client; created lazily so scripts and tests work without the app lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = create_pooled_client(headers=self._headers, timeout=self._timeout)
+        return self._client
+
+    async def start(self) -> None:
+        _ = self.http
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def cache_stats(self) -> dict:
+        return {
+            **self._cache.stats(),
+            "negative_hits": self.negative_hits,
+            "errors": self.errors,
+            "inflight_keys": len(self._inflight),
+            "queued": self._limiter.waiting,
+            "db": self._store.stats(),
+            "gazetteer": gazetteer.stats(),
+        }
+
+    def peek(self, key: str) -> dict | None:
+        """Cached result for `key` without any network call (None if absent or negative)."""
+        entry = self._cache.get_entry(key, count=False)
+        return entry.value if entry is not None else None
+
+    async def _get(self, path: str, params: dict) -> httpx.Response:
+        """GET from Nominatim within the policy limits, honouring UPSTREAM_MODE record/replay."""
+        url = f"{NOMINATIM_URL}{path}"
+        if settings.UPSTREAM_MODE == "replay":
+            return await upstream_archive.replay("nominatim", url, path, params)
+        async with self._limiter.slot(timeout=settings.NOMINATIM_MAX_QUEUE_SECONDS):
+            started = time.monotonic()
+            resp = await self.http.get(url, params=params)
+        if settings.UPSTREAM_MODE == "record":
+            upstream_archive.record("nominatim", path, params, resp, time.monotonic() - started)
+        return resp
+
+    async def lookup(
+        self, kind: str, value: str, path: str, params: dict, parse: Callable[[object], dict | None],
+        **log_fields,
+    ) -> dict | None:
+        """Cached, single-flight lookup of a "city" (normalized name) or "coords" (rounded
+        "lat,lon") key: memory, then the database, then Nominatim. `parse` turns a 200 body into
+        the result, or None for no match. Raises GeocodingUnavailableError when the lookup
+        itself fails, for every caller that shared it."""
+        key = f"{kind}:{value}"
+        entry = await self._cache.aget_entry(key)
+        if entry is not None:
+            if entry.value is None:
+                self.negative_hits += 1
+            return entry.value
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(
+                self._fetch(kind, value, path, params, parse, log_fields)
+            )
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller going away does not cancel the lookup for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self, kind: str, value: str, path: str, params: dict, parse: Callable[[object], dict | None],
+        log_fields: dict,
+    ) -> dict | None:
+        key = f"{kind}:{value}"
+        stored = await self._store.get(kind, value)
+        if stored is not None:
+            result, remaining = stored
+            await self._cache.aset(key, result, ttl=remaining)
+            return result
+
+        # As for WeatherBit, replay (archive answers, misses) never touches the breaker
+        guarded = settings.UPSTREAM_MODE != "replay"
+        if guarded and not breaker.allow_request():
+            logger.info("geocoding_circuit_open", path=path, **log_fields)
+            raise GeocodingUnavailableError(detail="Geocoding circuit open")
+
+        try:
+            resp = await self._get(path, params)
+            if guarded:
+                breaker.record_status(resp.status_code)
+            if resp.status_code != 200:
+                raise GeocodingUnavailableError(detail=f"Nominatim error: {resp.status_code}")
+            result = parse(resp.json())
+        except TimeoutError:
+            self.errors += 1
+            logger.warning("geocoding_queue_timeout", path=path, queued=self._limiter.waiting, **log_fields)
+            raise GeocodingUnavailableError(detail="Geocoding queue full") from None
+        except GeocodingUnavailableError as e:
+            self.errors += 1
+            logger.warning("geocoding_error", path=path, error=e.detail, **log_fields)
+            raise
+        except Exception as e:
+            if guarded:
+                breaker.record_failure()
+            self.errors += 1
+            logger.warning("geocoding_error", path=path, error=str(e), **log_fields)
+            raise GeocodingUnavailableError() from e
+
+        if result is None:
+            await self._cache.aset(key, None, ttl=settings.GEOCODE_NEGATIVE_TTL_SECONDS)
+            logger.info("geocoding_no_match", path=path, **log_fields)
+        else:
+            await self._cache.aset(key, result)
+            logger.info("geocoding_success", path=path, result=result, **log_fields)
+            await self._store.put(kind, value, result, lat=params.get("lat"), lon=params.get("lon"))
+        return result
+
+
+nominatim = NominatimClient()
+
+
+def cache_stats() -> dict:
+    return nominatim.cache_stats()
+
+
+def _mock_city(city: str) -> dict | None:
+    """UPSTREAM_MODE=mock: resolve from the bundled city table only, never the network."""
+    from app.services.mock_weather import CITY_DB
+
+    info = CITY_DB.get(city.lower().strip())
+    if info is None:
+        return None
+    return {"city": city.title(), "country": info["cc"], "lat": info["lat"], "lon": info["lon"]}
+
+
+def normalize_name(city: str) -> str:
+    """Lookup form of a place name: case-folded with whitespace collapsed."""
+    return " ".join(city.lower().split())
+
+
+def cached_city(city: str) -> dict | None:
+    """validate_city's cached answer, without a network call."""
+    return nominatim.peek(f"city:{normalize_name(city)}")
+
+
+def cached_reverse(lat: float, lon: float) -> dict | None:
+    """reverse_geocode's cached answer, without a network call."""
+    return nominatim.peek(f"coords:{coord_key(lat, lon)}")
 
 
 async def validate_city(city: str) -> dict | None:
-    """Validate city name and return location info, or None if invalid."""
-    key = f"city:{city.lower().strip()}"
-    if key in _cache:
-        return _cache[key]
+    """Validate city name and return location info, or None if no such place exists.
 
-    try:
-        async with httpx.AsyncClient(timeout=5, headers=HEADERS) as client:
-            resp = await client.get(f"{NOMINATIM_URL}/search", params={
-                "q": city,
-                "format": "json",
-                "limit": 1,
-                "addressdetails": 1,
-            })
-            if resp.status_code == 200:
-                data = resp.json()
-                if data:
-                    r = data[0]
-                    addr = r.get("address", {})
-                    result = {
-                        "city": addr.get("city") or addr.get("town") or addr.get("village") or addr.get("municipality") or city.title(),
-                        "country": addr.get("country_code", "xx").upper(),
-                        "lat": float(r["lat"]),
-                        "lon": float(r["lon"]),
-                    }
-                    _cache[key] = result
-                    logger.info("geocoding_success", city=city, result=result)
-                    return result
-    except Exception as e:
-        logger.warning("geocoding_error", city=city, error=str(e))
-
-    _cache[key] = None
-    return None
+    Raises GeocodingUnavailableError when the lookup fails, so callers can tell an outage from
+    an unknown city. Names in the offline gazetteer resolve without any lookup.
+    """
+    if settings.UPSTREAM_MODE == "mock":
+        return _mock_city(city) or gazetteer.lookup(city)
+
+    known = gazetteer.lookup(city)
+    if known is not None:
+        return known
+
+    return await nominatim.lookup(
+        "city",
+        normalize_name(city),
+        "/search",
+        {"q": city, "format": "json", "limit": 1, "addressdetails": 1},
+        lambda data: _parse_search(data, city),
+        city=city,
+    )
 
 
 async def reverse_geocode(lat: float, lon: float) -> dict | None:
-    """Get city name from coordinates."""
-    key = f"coords:{lat:.2f},{lon:.2f}"
-    if key in _cache:
-        return _cache[key]
+    """Get city name from coordinates. Only labels results, so failures also return None.
+    Points near a city in the offline gazetteer are labelled with it without any lookup."""
+    if settings.GAZETTEER_REVERSE_RADIUS_KM > 0:
+        near = gazetteer.nearest(lat, lon, settings.GAZETTEER_REVERSE_RADIUS_KM)
+        if near is not None:
+            return near
+    if settings.UPSTREAM_MODE == "mock":
+        return None
 
     try:
-        async with httpx.AsyncClient(timeout=5, headers=HEADERS) as client:
-            resp = await client.get(f"{NOMINATIM_URL}/reverse", params={
-                "lat": lat,
-                "lon": lon,
-                "format": "json",
-                "addressdetails": 1,
-            })
-            if resp.status_code == 200:
-                data = resp.json()
-                addr = data.get("address", {})
-                result = {
-                    "city": addr.get("city") or addr.get("town") or addr.get("village") or addr.get("municipality") or addr.get("county") or "Unknown",
-                    "country": addr.get("country_code", "xx").upper(),
-                }
-                _cache[key] = result
-                logger.info("reverse_geocoding_success", lat=lat, lon=lon, result=result)
-                return result
-    except Exception as e:
-        logger.warning("reverse_geocoding_error", lat=lat, lon=lon, error=str(e))
-
-    _cache[key] = None
-    return None
+        return await nominatim.lookup(
+            "coords",
+            coord_key(lat, lon),
+            "/reverse",
+            {"lat": lat, "lon": lon, "format": "json", "addressdetails": 1},
+            _parse_reverse,
+            lat=lat,
+            lon=lon,
+        )
+    except GeocodingUnavailableError:
+        return None
@@ -6,6 +6,8 @@ import math
 import time
 from datetime import datetime, timedelta, timezone
 
+from app.utils.spatial import SpatialIndex
+
 CITY_DB: dict[str, dict] = {
     "london": {"lat": 51.51, "lon": -0.13, "cc": "GB"},
     "new york": {"lat": 40.71, "lon": -74.01, "cc": "US"},
@@ -55,6 +57,26 @@ CITY_DB: dict[str, dict] = {
     "rome": {"lat": 41.90, "lon": 12.50, "cc": "IT"},
 }
 
+# Coordinates within this distance of a CITY_DB city take its name; beyond _LOCAL_AREA_KM
+# (and without a geocode) a point is just "Local Area"
+_NEAR_CITY_KM = 100.0
+_LOCAL_AREA_KM = 2000.0
+
+# Nearest-city index over CITY_DB; aliases sharing coordinates (delhi / new delhi) keep the first name
+_CITY_POINTS: dict[tuple[float, float], str] = {}
+for _name, _info in CITY_DB.items():
+    _CITY_POINTS.setdefault((_info["lat"], _info["lon"]), _name)
+_CITY_INDEX = SpatialIndex(_CITY_POINTS)
+_CITY_KEYS = list(_CITY_POINTS.values())
+
+
+def _nearest_city(lat: float, lon: float) -> tuple[str, str, float]:
+    """Closest CITY_DB city to a point: (display name, country code, great-circle km)."""
+    i, km = _CITY_INDEX.nearest(lat, lon)
+    name = _CITY_KEYS[i]
+    return name.title(), CITY_DB[name]["cc"], km
+
+
 WEATHER_CONDITIONS = [
     {"description": "Clear Sky", "icon": "c01d"},
     {"description": "Few Clouds", "icon": "c02d"},
@@ -87,11 +109,14 @@ def _bucket() -> int:
     return int(time.time()) // 300
 
 
-_geo_cache: dict[str, tuple] = {}
+def bucket_started_at() -> float:
+    """Start of the current 5-minute bucket; the version of all mock data generated in it."""
+    return float(_bucket() * 300)
 
 
 async def _resolve_city_async(city: str | None, lat: float | None, lon: float | None):
     """Resolve inputs to (city_name, lat, lon, country_code) with geocoding fallback."""
+    from app.core.exceptions import GeocodingUnavailableError
     from app.services.geocoding import validate_city, reverse_geocode
 
     if city:
@@ -99,71 +124,55 @@ async def _resolve_city_async(city: str | None, lat: float | None, lon: float |
         if key in CITY_DB:
             info = CITY_DB[key]
             return city.title(), info["lat"], info["lon"], info["cc"]
-        # Try geocoding API
-        cache_key = f"city:{key}"
-        if cache_key in _geo_cache:
-            return _geo_cache[cache_key]
-        geo = await validate_city(city)
+        # Offline gazetteer, then the geocoding API (cached by the geocoding service)
+        try:
+            geo = await validate_city(city)
+        except GeocodingUnavailableError:
+            # Geocoding is down too: generate a stable location rather than reject a real city
+            return _resolve_city(city, None, None)
         if geo:
-            result = (geo["city"], geo["lat"], geo["lon"], geo["country"])
-            _geo_cache[cache_key] = result
-            return result
+            return geo["city"], geo["lat"], geo["lon"], geo["country"]
         return None  # Invalid city
 
     if lat is not None and lon is not None:
         # Check local DB first
-        best_name, best_cc = None, None
-        best_dist = float("inf")
-        for name, info in CITY_DB.items():
-            dist = (info["lat"] - lat) ** 2 + (info["lon"] - lon) ** 2
-            if dist < best_dist:
-                best_dist = dist
-                best_name = name.title()
-                best_cc = info["cc"]
-        if best_dist < 1:  # Close enough
+        best_name, best_cc, best_km = _nearest_city(lat, lon)
+        if best_km < _NEAR_CITY_KM:
             return best_name, lat, lon, best_cc
-        # Try reverse geocoding
-        cache_key = f"coords:{lat:.2f},{lon:.2f}"
-        if cache_key in _geo_cache:
-            return _geo_cache[cache_key]
+        # Reverse geocoding: the offline gazetteer near known cities, otherwise Nominatim
         geo = await reverse_geocode(lat, lon)
         if geo:
-            result = (geo["city"], lat, lon, geo["country"])
-            _geo_cache[cache_key] = result
-            return result
-        if best_name:
-            return best_name, lat, lon, best_cc
-        return "Unknown", lat, lon, "XX"
+            return geo["city"], lat, lon, geo["country"]
+        return best_name, lat, lon, best_cc
 
     return "London", 51.51, -0.13, "GB"
 
 
 def _resolve_city(city: str | None, lat: float | None, lon: float | None):
-    """Sync version - uses cache only, no API calls."""
+    """Sync version - uses the offline gazetteer and cached geocodes only, no API calls."""
+    from app.core.config import settings
+    from app.services.gazetteer import gazetteer
+    from app.services.geocoding import cached_city, cached_reverse
+
     if city:
         key = city.lower().strip()
         if key in CITY_DB:
             info = CITY_DB[key]
             return city.title(), info["lat"], info["lon"], info["cc"]
-        cache_key = f"city:{key}"
-        if cache_key in _geo_cache:
-            return _geo_cache[cache_key]
+        geo = gazetteer.lookup(city) or cached_city(city)
+        if geo:
+            return geo["city"], geo["lat"], geo["lon"], geo["country"]
         h = _hash_seed(key)
         return city.title(), 20 + h * 40, -10 + h * 100, "XX"
 
     if lat is not None and lon is not None:
-        cache_key = f"coords:{lat:.2f},{lon:.2f}"
-        if cache_key in _geo_cache:
-            return _geo_cache[cache_key]
-        best_name, best_cc = "Unknown", "XX"
-        best_dist = float("inf")
-        for name, info in CITY_DB.items():
-            dist = (info["lat"] - lat) ** 2 + (info["lon"] - lon) ** 2
-            if dist < best_dist:
-                best_dist = dist
-                best_name = name.title()
-                best_cc = info["cc"]
-        if best_dist > 400:
+        geo = cached_reverse(lat, lon)
+        if not geo and settings.GAZETTEER_REVERSE_RADIUS_KM > 0:
+            geo = gazetteer.nearest(lat, lon, settings.GAZETTEER_REVERSE_RADIUS_KM)
+        if geo:
+            return geo["city"], lat, lon, geo["country"]
+        best_name, best_cc, best_km = _nearest_city(lat, lon)
+        if best_km > _LOCAL_AREA_KM:
             best_name, best_cc = "Local Area", "XX"
         return best_name, lat, lon, best_cc
 
@@ -0,0 +1,133 @@
+"""Background refresh of watchlisted locations ahead of cache expiry.
+
+Every PREFETCH_INTERVAL_SECONDS (plus jitter) the scheduler ranks watchlisted locations by
+watcher count and recent request traffic, then re-fetches the top PREFETCH_MAX_LOCATIONS whose
+cached weather is within PREFETCH_LEAD_SECONDS of its TTL. Locations are refreshed one at a time
+through the shared WeatherBit client, so its token bucket still governs upstream load. While
+the upstream circuit is open or refreshes fail, cycles back off exponentially.
+"""
+
+import asyncio
+import math
+import random
+import time
+
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.exceptions import AppException
+from app.db.session import async_session_factory
+from app.repositories.location_repository import LocationRepository
+from app.services.weather_client import CACHE_TTL_SECONDS, weather_client
+from app.utils.cache import TTLCache
+from app.utils.circuit_breaker import CircuitState
+
+logger = structlog.get_logger()
+
+
+class PrefetchScheduler:
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession] = async_session_factory):
+        self._session_factory = session_factory
+        self._task: asyncio.Task | None = None
+        # normalized city -> (decayed request score, last update); bounded so typos age out
+        self._access = TTLCache(ttl=settings.PREFETCH_ACCESS_HALF_LIFE_SECONDS * 8, max_entries=10000)
+        self._backoff = 0.0
+
+    def note_access(self, city: str | None) -> None:
+        """Record a user request so frequently viewed watchlist cities are refreshed first."""
+        if not city:
+            return
+        key = city.lower().strip()
+        score = self._access_score(key) + 1.0
+        self._access.set(key, (score, time.time()), size=0)
+
+    def _access_score(self, key: str) -> float:
+        entry = self._access.get_entry(key, count=False)
+        if entry is None:
+            return 0.0
+        score, updated = entry.value
+        return score * math.pow(0.5, (time.time() - updated) / settings.PREFETCH_ACCESS_HALF_LIFE_SECONDS)
+
+    def rank(self, watched: list[tuple[str, int]]) -> list[str]:
+        """Order (city, watchers) pairs by watchers plus weighted recent access."""
+        scored = [
+            (watchers + settings.PREFETCH_ACCESS_WEIGHT * self._access_score(city.lower().strip()), city)
+            for city, watchers in watched
+        ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [city for _, city in scored[: settings.PREFETCH_MAX_LOCATIONS]]
+
+    async def _hot_cities(self) -> list[str]:
+        async with self._session_factory() as session:
+            rows = await LocationRepository(session).get_most_watched(settings.PREFETCH_MAX_LOCATIONS * 2)
+        return self.rank([(location.city_name, watchers) for location, watchers in rows])
+
+    async def _refresh(self, city: str) -> bool:
+        max_age = CACHE_TTL_SECONDS - settings.PREFETCH_LEAD_SECONDS
+        try:
+            location = await weather_client.resolve_location(city=city)
+            coordinates = location.coordinates
+            fetches = [
+                weather_client.get_forecast_daily(city=city, days=5, max_age=max_age, location=location),
+                weather_client.get_current_weather(city=city, max_age=max_age, location=location),
+                weather_client.get_forecast_hourly(city=city, hours=48, max_age=max_age, location=location),
+            ]
+            if coordinates:
+                fetches.append(weather_client.get_alerts(lat=coordinates[0], lon=coordinates[1], max_age=max_age))
+            results = list(await asyncio.gather(*fetches))
+            # Geocoding unavailable (city passed by name): alerts use the forecast's lat/lon
+            daily_raw = results[0].data
+            if not coordinates and daily_raw.get("lat") and daily_raw.get("lon"):
+                results.append(
+                    await weather_client.get_alerts(lat=daily_raw["lat"], lon=daily_raw["lon"], max_age=max_age)
+                )
+        except AppException as e:
+            logger.info("prefetch_skipped", city=city, error=e.detail)
+            return True
+        return all(result.source == "live" for result in results)
+
+    async def run_once(self) -> tuple[int, int]:
+        """Refresh the current hot set once; returns (locations refreshed, failures)."""
+        cities = await self._hot_cities()
+        failures = 0
+        for city in cities:
+            if weather_client.breaker.state is CircuitState.OPEN:
+                failures += 1
+                break
+            if not await self._refresh(city):
+                failures += 1
+        return len(cities), failures
+
+    async def _run(self) -> None:
+        while True:
+            delay = settings.PREFETCH_INTERVAL_SECONDS + self._backoff
+            await asyncio.sleep(delay + random.uniform(0, settings.PREFETCH_JITTER_SECONDS))
+            try:
+                refreshed, failures = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("prefetch_cycle_error", error=str(e))
+                refreshed, failures = 0, 1
+            if failures:
+                self._backoff = min(
+                    max(self._backoff * 2, settings.PREFETCH_INTERVAL_SECONDS),
+                    settings.PREFETCH_MAX_BACKOFF_SECONDS,
+                )
+            else:
+                self._backoff = 0.0
+            logger.info("prefetch_cycle", locations=refreshed, failures=failures, backoff=self._backoff)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+prefetch_scheduler = PrefetchScheduler()
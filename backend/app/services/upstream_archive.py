@@ -0,0 +1,84 @@
+"""On-disk archive of upstream (WeatherBit / Nominatim) responses for record and replay modes.
+
+UPSTREAM_MODE=record stores every upstream response under UPSTREAM_ARCHIVE_DIR, keyed by
+service, endpoint and query params (never credentials). UPSTREAM_MODE=replay serves those
+responses back without touching the network, optionally sleeping for the recorded latency.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import httpx
+import structlog
+
+from app.core.config import settings
+from app.core.exceptions import ExternalAPIError
+
+logger = structlog.get_logger()
+
+
+class UpstreamArchive:
+    def __init__(self, directory: str):
+        self._directory = Path(directory)
+
+    @staticmethod
+    def request_key(service: str, endpoint: str, params: dict) -> str:
+        canonical = json.dumps(
+            {"service": service, "endpoint": endpoint, "params": {k: str(v) for k, v in params.items()}},
+            sort_keys=True,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+    def _path(self, service: str, endpoint: str, params: dict) -> Path:
+        return self._directory / service / f"{self.request_key(service, endpoint, params)}.json"
+
+    def record(
+        self, service: str, endpoint: str, params: dict, response: httpx.Response, latency: float
+    ) -> None:
+        path = self._path(service, endpoint, params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        record = {
+            "service": service,
+            "endpoint": endpoint,
+            "params": {k: str(v) for k, v in params.items()},
+            "status_code": response.status_code,
+            "latency": round(latency, 4),
+            "body": response.text,
+        }
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(record))
+        os.replace(tmp, path)
+
+    def load(self, service: str, endpoint: str, params: dict) -> dict | None:
+        path = self._path(service, endpoint, params)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def iter_records(self, service: str):
+        """Yield every recorded response for a service (used by offline comparison scripts)."""
+        directory = self._directory / service
+        if not directory.is_dir():
+            return
+        for path in sorted(directory.glob("*.json")):
+            yield json.loads(path.read_text())
+
+    async def replay(self, service: str, url: str, endpoint: str, params: dict) -> httpx.Response:
+        record = self.load(service, endpoint, params)
+        if record is None:
+            raise ExternalAPIError(detail=f"No recorded {service} response for {endpoint}")
+        if settings.UPSTREAM_REPLAY_LATENCY:
+            await asyncio.sleep(record["latency"])
+        logger.info("upstream_replay", service=service, endpoint=endpoint)
+        return httpx.Response(
+            record["status_code"],
+            content=record["body"].encode(),
+            headers={"content-type": "application/json"},
+            request=httpx.Request("GET", url, params=params),
+        )
+
+
+upstream_archive = UpstreamArchive(settings.UPSTREAM_ARCHIVE_DIR)
@@ -1,22 +1,81 @@
 """Centralized WeatherBit API client with retry, timeout, TTL cache, rate-limiting and graceful degradation."""
 
-import time
 import asyncio
+import time
+from typing import NamedTuple
+
 import structlog
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from app.core.config import settings
-from app.core.exceptions import ExternalAPIError, RateLimitError
+from app.core.exceptions import CircuitOpenError, ExternalAPIError, GeocodingUnavailableError, RateLimitError
+from app.services.upstream_archive import upstream_archive
+from app.utils.cache import CacheEntry, KeyedLocks, create_cache_backend
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.forecast import daily_from_hourly
+from app.utils.geo import coord_params
+from app.utils.http import create_pooled_client
+from app.utils.rate_limit import UpstreamLimiter
 
 logger = structlog.get_logger()
 
 CACHE_TTL_SECONDS = 300  # 5 minutes — matches frontend staleTime and mock bucket
-MIN_REQUEST_INTERVAL = 0.5  # seconds between external API calls
+
+# TransportError covers timeouts and connect failures, plus the ReadError / RemoteProtocolError a
+# pooled keep-alive connection raises when the server has closed it
+UPSTREAM_ERRORS = (ExternalAPIError, RateLimitError, httpx.TransportError)
+
+
+def _raise_for_status(response: httpx.Response) -> None:
+    if response.status_code == 429:
+        raise RateLimitError()
+    if response.status_code >= 500:
+        raise ExternalAPIError(detail=f"WeatherBit API error: {response.status_code}")
+    if response.status_code >= 400:
+        raise ExternalAPIError(
+            detail=f"WeatherBit API client error: {response.status_code} - {response.text}"
+        )
+
+
+class UpstreamResult(NamedTuple):
+    data: dict
+    source: str  # "live", "stale" (cached past its TTL) or "mock"
+    stored_at: float = 0.0  # when the upstream data was fetched (mock: start of its 5-minute bucket)
+
+
+def _mock_result(data: dict) -> UpstreamResult:
+    from app.services.mock_weather import bucket_started_at
+    return UpstreamResult(data, "mock", bucket_started_at())
+
+
+class ResolvedLocation:
+    """Upstream location params plus the geocoded label (possibly still being looked up)."""
+
+    def __init__(
+        self,
+        params: dict[str, str],
+        geo_info: dict | None = None,
+        geo_task: asyncio.Task | None = None,
+    ):
+        self.params = params
+        self._geo_info = geo_info
+        self._geo_task = geo_task
+
+    @property
+    def coordinates(self) -> tuple[float, float] | None:
+        if "lat" in self.params and "lon" in self.params:
+            return float(self.params["lat"]), float(self.params["lon"])
+        return None
+
+    async def geo_info(self) -> dict | None:
+        if self._geo_task is not None:
+            return await self._geo_task
+        return self._geo_info
 
 
 class WeatherBitClient:
-    """HTTP client for WeatherBit API via RapidAPI with TTL cache and global rate-limiter."""
+    """HTTP client for WeatherBit API via RapidAPI with TTL cache and token-bucket rate limiter."""
 
     def __init__(self):
         self._base_url = settings.WEATHERBIT_BASE_URL
@@ -25,204 +84,337 @@ class WeatherBitClient:
             "x-rapidapi-host": settings.RAPIDAPI_HOST,
         }
         self._timeout = httpx.Timeout(settings.API_TIMEOUT_SECONDS)
-        self._cache: dict[str, tuple[float, dict]] = {}
-        self._cache_locks: dict[str, asyncio.Lock] = {}
-        self._rate_lock = asyncio.Lock()
-        self._last_request_time = 0.0
+        # Entries outlive their freshness TTL so they can still be served stale
+        self._cache = create_cache_backend(
+            "weather",
+            ttl=CACHE_TTL_SECONDS + max(
+                settings.CACHE_STALE_WHILE_REVALIDATE_SECONDS, settings.CACHE_STALE_IF_ERROR_SECONDS
+            ),
+            max_entries=settings.WEATHER_CACHE_MAX_ENTRIES,
+            max_bytes=settings.WEATHER_CACHE_MAX_BYTES,
+            sweep_interval=settings.CACHE_SWEEP_INTERVAL_SECONDS,
+        )
+        self._cache_locks = KeyedLocks()
+        self._refreshing: set[str] = set()
+        self._background: set[asyncio.Task] = set()
+        self._limiter = UpstreamLimiter(
+            rate=settings.WEATHERBIT_RATE_PER_SECOND,
+            burst=settings.WEATHERBIT_RATE_BURST,
+            max_in_flight=settings.WEATHERBIT_MAX_IN_FLIGHT,
+        )
+        self._client: httpx.AsyncClient | None = None
+        self.breaker = CircuitBreaker(
+            "weatherbit",
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout=settings.CIRCUIT_RECOVERY_SECONDS,
+            half_open_max_calls=settings.CIRCUIT_HALF_OPEN_PROBES,
+        )
 
     def _build_client(self) -> httpx.AsyncClient:
-        return httpx.AsyncClient(
-            headers=self._headers,
-            timeout=self._timeout,
-        )
+        return create_pooled_client(headers=self._headers, timeout=self._timeout)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared pooled client; created lazily so scripts and tests work without the app lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def start(self) -> None:
+        """Open the pooled connection client up front (called from the app lifespan)."""
+        _ = self.http
+
+    async def aclose(self) -> None:
+        """Cancel background revalidations and close pooled connections on shutdown."""
+        for task in list(self._background):
+            task.cancel()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
 
     def _cache_key(self, endpoint: str, params: dict) -> str:
         sorted_params = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
         return f"{endpoint}?{sorted_params}"
 
-    def _get_cached(self, key: str) -> dict | None:
-        entry = self._cache.get(key)
-        if entry is None:
-            return None
-        cached_at, data = entry
-        if time.monotonic() - cached_at > CACHE_TTL_SECONDS:
-            del self._cache[key]
-            return None
-        return data
-
-    def _set_cached(self, key: str, data: dict) -> None:
-        self._cache[key] = (time.monotonic(), data)
-
-    def _get_cache_lock(self, key: str) -> asyncio.Lock:
-        if key not in self._cache_locks:
-            self._cache_locks[key] = asyncio.Lock()
-        return self._cache_locks[key]
+    def cache_stats(self) -> dict:
+        return {**self._cache.stats(), "inflight_keys": len(self._cache_locks)}
 
     async def _rate_limited_fetch(self, url: str, params: dict) -> httpx.Response:
-        """Make an HTTP request while respecting the global rate limit."""
-        async with self._rate_lock:
-            now = time.monotonic()
-            wait = MIN_REQUEST_INTERVAL - (now - self._last_request_time)
-            if wait > 0:
-                await asyncio.sleep(wait)
-            async with self._build_client() as client:
-                response = await client.get(url, params=params)
-            self._last_request_time = time.monotonic()
-            return response
+        """Make an HTTP request once the limiter grants a start slot; other requests stay in flight."""
+        async with self._limiter.slot():
+            return await self.http.get(url, params=params)
 
     @retry(
         stop=stop_after_attempt(2),
         wait=wait_exponential(multiplier=0.5, min=0.5, max=3),
-        retry=retry_if_exception_type((httpx.TimeoutException, httpx.ConnectError)),
+        retry=retry_if_exception_type(httpx.TransportError),
         reraise=True,
     )
-    async def _request(self, endpoint: str, params: dict) -> dict:
+    async def _fetch(self, endpoint: str, params: dict) -> httpx.Response:
+        url = f"{self._base_url}{endpoint}"
+        if settings.UPSTREAM_MODE == "replay":
+            response = await upstream_archive.replay("weatherbit", url, endpoint, params)
+        else:
+            logger.info("weather_api_request", endpoint=endpoint, params=params)
+            started = time.monotonic()
+            response = await self._rate_limited_fetch(url, params)
+            if settings.UPSTREAM_MODE == "record":
+                upstream_archive.record("weatherbit", endpoint, params, response, time.monotonic() - started)
+        return response
+
+    async def _fetch_and_store(self, key: str, endpoint: str, params: dict) -> tuple[dict, float]:
+        # Fail fast (straight to stale/mock fallback) instead of paying retries and timeouts
+        if not self._headers["x-rapidapi-key"] and settings.UPSTREAM_MODE != "replay":
+            raise ExternalAPIError(detail="RAPIDAPI_KEY is not configured")
+        # Replay answers from the archive: no upstream to protect, and archive misses must not
+        # open the circuit and turn later recorded answers into mock data
+        guarded = settings.UPSTREAM_MODE != "replay"
+        if guarded and not self.breaker.allow_request():
+            raise CircuitOpenError(detail="WeatherBit circuit open")
+        try:
+            response = await self._fetch(endpoint, params)
+        except httpx.TransportError:
+            if guarded:
+                self.breaker.record_failure()
+            raise
+        if guarded:
+            self.breaker.record_status(response.status_code)
+        _raise_for_status(response)
+        data = response.json()
+        stored_at = time.time()
+        await self._cache.aset(key, data, size=len(response.content), stored_at=stored_at)
+        return data, stored_at
+
+    def _schedule_refresh(self, key: str, endpoint: str, params: dict) -> None:
+        """Revalidate a stale entry in the background; at most one refresh per key at a time."""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh() -> None:
+            try:
+                async with self._cache_locks.hold(key):
+                    entry = await self._cache.aget_entry(key, count=False)
+                    if entry is not None and self._age(entry) <= CACHE_TTL_SECONDS:
+                        return
+                    await self._fetch_and_store(key, endpoint, params)
+                    logger.info("weather_api_revalidated", endpoint=endpoint)
+            except UPSTREAM_ERRORS as e:
+                logger.warning("weather_api_revalidate_failed", endpoint=endpoint, error=str(e))
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @staticmethod
+    def _age(entry: CacheEntry) -> float:
+        return time.time() - entry.stored_at
+
+    async def _request(
+        self, endpoint: str, params: dict, max_age: float | None = None
+    ) -> tuple[dict, bool, float]:
+        """Return (data, is_stale, stored_at).
+
+        Fresh entries are served directly. Entries within the stale-while-revalidate grace window
+        are served immediately while a background refresh runs. On upstream failure any entry
+        still inside the stale-if-error window is served instead of raising.
+
+        `max_age` (used by the prefetcher) treats younger-than-TTL entries as due for a refresh and
+        waits for it instead of revalidating in the background.
+        """
         key = self._cache_key(endpoint, params)
+        fresh_for = CACHE_TTL_SECONDS if max_age is None else min(max_age, CACHE_TTL_SECONDS)
 
         # Fast path: return cached data without locking
-        cached = self._get_cached(key)
-        if cached is not None:
-            logger.info("weather_api_cache_hit", endpoint=endpoint)
-            return cached
+        entry = await self._cache.aget_entry(key)
+        if entry is not None:
+            age = self._age(entry)
+            if age <= fresh_for:
+                logger.info("weather_api_cache_hit", endpoint=endpoint)
+                return entry.value, False, entry.stored_at
+            if max_age is None and age <= CACHE_TTL_SECONDS + settings.CACHE_STALE_WHILE_REVALIDATE_SECONDS:
+                logger.info("weather_api_cache_stale_hit", endpoint=endpoint, age=round(age, 1))
+                self._schedule_refresh(key, endpoint, params)
+                return entry.value, True, entry.stored_at
 
         # Serialize requests for the same cache key to avoid duplicate API calls
-        lock = self._get_cache_lock(key)
-        async with lock:
-            cached = self._get_cached(key)
-            if cached is not None:
+        async with self._cache_locks.hold(key):
+            entry = await self._cache.aget_entry(key, count=False)
+            if entry is not None and self._age(entry) <= fresh_for:
                 logger.info("weather_api_cache_hit", endpoint=endpoint)
-                return cached
-
-            url = f"{self._base_url}{endpoint}"
-            logger.info("weather_api_request", endpoint=endpoint, params=params)
-            response = await self._rate_limited_fetch(url, params)
-
-            if response.status_code == 429:
-                raise RateLimitError()
-            if response.status_code >= 500:
-                raise ExternalAPIError(detail=f"WeatherBit API error: {response.status_code}")
-            if response.status_code >= 400:
-                raise ExternalAPIError(
-                    detail=f"WeatherBit API client error: {response.status_code} - {response.text}"
+                return entry.value, False, entry.stored_at
+
+            try:
+                data, stored_at = await self._fetch_and_store(key, endpoint, params)
+                return data, False, stored_at
+            except UPSTREAM_ERRORS as e:
+                if entry is None:
+                    raise
+                logger.warning(
+                    "weather_api_serving_stale", endpoint=endpoint, age=round(self._age(entry), 1), error=str(e)
                 )
+                return entry.value, True, entry.stored_at
 
-            data = response.json()
-            self._set_cached(key, data)
-            return data
-
-    async def get_current_weather(
+    async def resolve_location(
         self, city: str | None = None, lat: float | None = None, lon: float | None = None
-    ) -> tuple[dict, bool]:
-        from app.services.geocoding import validate_city, reverse_geocode
+    ) -> ResolvedLocation:
+        """Turn a request location into upstream params once, for reuse across several endpoints.
 
-        params: dict = {}
-        geo_info = None
+        City names are geocoded up front (the params depend on it). For coordinates the reverse
+        geocode only labels the result, so it is started here and awaited after the fetch.
+        """
+        if settings.UPSTREAM_MODE == "mock":
+            return ResolvedLocation({})
+
+        from app.services.geocoding import validate_city, reverse_geocode
 
         if city:
-            # Validate city via geocoding
-            geo_info = await validate_city(city)
-            if geo_info:
-                params["lat"] = str(geo_info["lat"])
-                params["lon"] = str(geo_info["lon"])
-            else:
+            try:
+                geo_info = await validate_city(city)
+            except GeocodingUnavailableError as e:
+                # WeatherBit resolves city names itself; only a confirmed unknown city is a 404
+                logger.warning("geocoding_unavailable_using_city_name", city=city, error=e.detail)
+                return ResolvedLocation({"city": city})
+            if not geo_info:
                 from app.core.exceptions import NotFoundError
                 raise NotFoundError(detail=f"City '{city}' not found")
-        elif lat is not None and lon is not None:
-            params["lat"] = str(lat)
-            params["lon"] = str(lon)
-            geo_info = await reverse_geocode(lat, lon)
-        else:
-            params["city"] = settings.DEFAULT_CITY
+            return ResolvedLocation(coord_params(geo_info["lat"], geo_info["lon"]), geo_info)
+        if lat is not None and lon is not None:
+            params = coord_params(lat, lon)
+            task = asyncio.create_task(reverse_geocode(float(params["lat"]), float(params["lon"])))
+            return ResolvedLocation(params, geo_task=task)
+        return ResolvedLocation({"city": settings.DEFAULT_CITY})
+
+    async def get_current_weather(
+        self,
+        city: str | None = None,
+        lat: float | None = None,
+        lon: float | None = None,
+        max_age: float | None = None,
+        location: ResolvedLocation | None = None,
+    ) -> UpstreamResult:
+        if settings.UPSTREAM_MODE == "mock":
+            from app.services.mock_weather import generate_current_async
+            return _mock_result(await generate_current_async(city=city, lat=lat, lon=lon))
 
+        location = location or await self.resolve_location(city, lat, lon)
         try:
-            data = await self._request("/current", params)
+            data, stale, stored_at = await self._request("/current", dict(location.params), max_age=max_age)
             # Enhance with geocoded info if available
+            geo_info = await location.geo_info()
             if geo_info and data.get("data"):
                 data["data"][0]["city_name"] = geo_info.get("city", data["data"][0].get("city_name", ""))
                 data["data"][0]["country_code"] = geo_info.get("country", data["data"][0].get("country_code", ""))
-            return data, False
-        except (ExternalAPIError, RateLimitError, httpx.TimeoutException, httpx.ConnectError) as e:
+            return UpstreamResult(data, "stale" if stale else "live", stored_at)
+        except UPSTREAM_ERRORS as e:
             logger.warning("weather_api_fallback_mock", endpoint="/current", error=str(e))
             from app.services.mock_weather import generate_current_async
-            return await generate_current_async(city=city, lat=lat, lon=lon), True
+            return _mock_result(await generate_current_async(city=city, lat=lat, lon=lon))
 
     async def get_forecast_daily(
-        self, city: str | None = None, lat: float | None = None, lon: float | None = None, days: int = 5
-    ) -> tuple[dict, bool]:
-        from app.services.geocoding import validate_city, reverse_geocode
-
-        params: dict = {"days": str(days)}
-        geo_info = None
-
-        if city:
-            geo_info = await validate_city(city)
-            if geo_info:
-                params["lat"] = str(geo_info["lat"])
-                params["lon"] = str(geo_info["lon"])
-            else:
-                from app.core.exceptions import NotFoundError
-                raise NotFoundError(detail=f"City '{city}' not found")
-        elif lat is not None and lon is not None:
-            params["lat"] = str(lat)
-            params["lon"] = str(lon)
-            geo_info = await reverse_geocode(lat, lon)
-        else:
-            params["city"] = settings.DEFAULT_CITY
+        self,
+        city: str | None = None,
+        lat: float | None = None,
+        lon: float | None = None,
+        days: int = 5,
+        max_age: float | None = None,
+        location: ResolvedLocation | None = None,
+    ) -> UpstreamResult:
+        if settings.UPSTREAM_MODE == "mock":
+            from app.services.mock_weather import generate_forecast_daily_async
+            return _mock_result(await generate_forecast_daily_async(city=city, lat=lat, lon=lon, days=days))
 
+        location = location or await self.resolve_location(city, lat, lon)
+        if settings.FORECAST_DAILY_FROM_HOURLY:
+            return await self._daily_from_hourly(city, lat, lon, days, max_age, location)
         try:
-            data = await self._request("/forecast/daily", params)
-            if geo_info:
-                data["city_name"] = geo_info.get("city", data.get("city_name", ""))
-                data["country_code"] = geo_info.get("country", data.get("country_code", ""))
-            return data, False
-        except (ExternalAPIError, RateLimitError, httpx.TimeoutException, httpx.ConnectError) as e:
+            params = {"days": str(settings.FORECAST_MAX_DAYS), **location.params}
+            data, stale, stored_at = await self._request("/forecast/daily", params, max_age=max_age)
+            view = _forecast_view(data, days, await location.geo_info())
+            return UpstreamResult(view, "stale" if stale else "live", stored_at)
+        except UPSTREAM_ERRORS as e:
             logger.warning("weather_api_fallback_mock", endpoint="/forecast/daily", error=str(e))
             from app.services.mock_weather import generate_forecast_daily_async
-            return await generate_forecast_daily_async(city=city, lat=lat, lon=lon, days=days), True
+            return _mock_result(await generate_forecast_daily_async(city=city, lat=lat, lon=lon, days=days))
 
     async def get_forecast_hourly(
-        self, city: str | None = None, lat: float | None = None, lon: float | None = None, hours: int = 48
-    ) -> tuple[dict, bool]:
-        from app.services.geocoding import validate_city, reverse_geocode
-
-        params: dict = {"hours": str(hours)}
-        geo_info = None
-
-        if city:
-            geo_info = await validate_city(city)
-            if geo_info:
-                params["lat"] = str(geo_info["lat"])
-                params["lon"] = str(geo_info["lon"])
-            else:
-                from app.core.exceptions import NotFoundError
-                raise NotFoundError(detail=f"City '{city}' not found")
-        elif lat is not None and lon is not None:
-            params["lat"] = str(lat)
-            params["lon"] = str(lon)
-            geo_info = await reverse_geocode(lat, lon)
-        else:
-            params["city"] = settings.DEFAULT_CITY
+        self,
+        city: str | None = None,
+        lat: float | None = None,
+        lon: float | None = None,
+        hours: int = 48,
+        max_age: float | None = None,
+        location: ResolvedLocation | None = None,
+    ) -> UpstreamResult:
+        if settings.UPSTREAM_MODE == "mock":
+            from app.services.mock_weather import generate_forecast_hourly_async
+            return _mock_result(await generate_forecast_hourly_async(city=city, lat=lat, lon=lon, hours=hours))
 
+        location = location or await self.resolve_location(city, lat, lon)
         try:
-            data = await self._request("/forecast/hourly", params)
-            if geo_info:
-                data["city_name"] = geo_info.get("city", data.get("city_name", ""))
-                data["country_code"] = geo_info.get("country", data.get("country_code", ""))
-            return data, False
-        except (ExternalAPIError, RateLimitError, httpx.TimeoutException, httpx.ConnectError) as e:
+            params = {"hours": str(settings.FORECAST_HOURLY_HORIZON_HOURS), **location.params}
+            data, stale, stored_at = await self._request("/forecast/hourly", params, max_age=max_age)
+            view = _forecast_view(data, hours, await location.geo_info())
+            return UpstreamResult(view, "stale" if stale else "live", stored_at)
+        except UPSTREAM_ERRORS as e:
             logger.warning("weather_api_fallback_mock", endpoint="/forecast/hourly", error=str(e))
             from app.services.mock_weather import generate_forecast_hourly_async
-            return await generate_forecast_hourly_async(city=city, lat=lat, lon=lon, hours=hours), True
+            return _mock_result(await generate_forecast_hourly_async(city=city, lat=lat, lon=lon, hours=hours))
+
+    async def _daily_from_hourly(
+        self,
+        city: str | None,
+        lat: float | None,
+        lon: float | None,
+        days: int,
+        max_age: float | None,
+        location: ResolvedLocation,
+    ) -> UpstreamResult:
+        """Daily rows aggregated from the hourly series, saving the /forecast/daily call.
+
+        Only as many days as FORECAST_HOURLY_HORIZON_HOURS covers can be returned.
+        """
+        hourly = await self.get_forecast_hourly(
+            city=city, lat=lat, lon=lon, hours=settings.FORECAST_HOURLY_HORIZON_HOURS,
+            max_age=max_age, location=location,
+        )
+        if hourly.source == "mock":
+            from app.services.mock_weather import generate_forecast_daily_async
+            return _mock_result(await generate_forecast_daily_async(city=city, lat=lat, lon=lon, days=days))
+        data = {k: v for k, v in hourly.data.items() if k != "data"}
+        data["data"] = daily_from_hourly(hourly.data.get("data", []), days)
+        return UpstreamResult(data, hourly.source, hourly.stored_at)
+
+    async def get_alerts(self, lat: float, lon: float, max_age: float | None = None) -> UpstreamResult:
+        if settings.UPSTREAM_MODE == "mock":
+            from app.services.mock_weather import generate_alerts
+            return _mock_result(generate_alerts())
 
-    async def get_alerts(self, lat: float, lon: float) -> tuple[dict, bool]:
-        params = {"lat": str(lat), "lon": str(lon)}
+        params = coord_params(lat, lon)
         try:
-            data = await self._request("/alerts", params)
-            return data, False
-        except (ExternalAPIError, RateLimitError, httpx.TimeoutException, httpx.ConnectError) as e:
+            data, stale, stored_at = await self._request("/alerts", params, max_age=max_age)
+            return UpstreamResult(data, "stale" if stale else "live", stored_at)
+        except UPSTREAM_ERRORS as e:
             logger.warning("weather_alerts_fallback_mock", error=str(e))
             from app.services.mock_weather import generate_alerts
-            return generate_alerts(), True
+            return _mock_result(generate_alerts())
+
+
+def _forecast_view(data: dict, length: int, geo_info: dict | None) -> dict:
+    """A cached full-horizon forecast's first `length` rows, labelled with the geocoded place.
+
+    Returns a new top-level dict: the cached entry is shared by every horizon and place name
+    that resolves to the same coordinates, so it must stay as WeatherBit returned it.
+    """
+    view = {**data, "data": data.get("data", [])[:length]}
+    if geo_info:
+        view["city_name"] = geo_info.get("city", data.get("city_name", ""))
+        view["country_code"] = geo_info.get("country", data.get("country_code", ""))
+    return view
 
 
 weather_client = WeatherBitClient()
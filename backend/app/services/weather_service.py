@@ -1,9 +1,16 @@
 """Weather service - transforms raw API data into application DTOs."""
 
 import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
 
+import orjson
 import structlog
+from pydantic import BaseModel
 
+from app.core.config import settings
 from app.schemas.weather import (
     CurrentWeatherData,
     CurrentWeatherResponse,
@@ -12,109 +19,441 @@ from app.schemas.weather import (
     HourlyForecast,
     WeatherAlert,
 )
-from app.services.weather_client import weather_client
+from app.services.prefetch_scheduler import prefetch_scheduler
+from app.services.weather_client import CACHE_TTL_SECONDS, UpstreamResult, weather_client
+from app.utils import media
+from app.utils.cache import KeyedLocks, TTLCache
+from app.utils.compression import compress_variants
+from app.utils.conditional import content_etag, make_etag
+from app.utils.delta import diff_document
+from app.utils.geo import coord_params
+from app.utils.projection import Selection, selection_key
 
 logger = structlog.get_logger()
 
+# Finished responses (DTO + encoded JSON), shared by identical requests until their data expires
+# (the byte budget counts the JSON variants; binary alternates are smaller and added lazily)
+_results = TTLCache(
+    ttl=settings.WEATHER_RESULT_MEMO_SECONDS,
+    max_entries=settings.WEATHER_RESULT_MEMO_MAX_ENTRIES,
+    max_bytes=settings.WEATHER_RESULT_MEMO_MAX_BYTES,
+)
+_result_locks = KeyedLocks()
+
+# Recent row-layout forecast versions per query: key -> deque of (etag, JSON-ready body, size)
+_versions = TTLCache(
+    ttl=settings.FORECAST_DELTA_HISTORY_SECONDS,
+    max_entries=settings.WEATHER_RESULT_MEMO_MAX_ENTRIES,
+    max_bytes=settings.FORECAST_DELTA_MAX_BYTES,
+)
+# Forecast series diffed row by row in deltas, with the field identifying a row
+_DELTA_SERIES = {"daily": "date", "hourly": "timestamp"}
+
+# Worst component wins when a response is assembled from several upstream calls
+_SOURCE_RANK = {"live": 0, "stale": 1, "mock": 2}
+
+
+def _combined_source(*sources: str) -> str:
+    return max(sources, key=lambda s: _SOURCE_RANK.get(s, 0))
+
+
+@dataclass(slots=True)
+class WeatherResult:
+    """A response body (DTO, or a plain dict for compact formats), its encoded JSON (plain and
+    precompressed) and the version of the upstream data it was built from."""
+
+    body: BaseModel | dict
+    etag: str
+    last_modified: float
+    expires_at: float
+    variants: dict[str, bytes] = field(default_factory=dict, repr=False)
+    # Binary media type -> its variants, encoded on first request and kept with the result
+    alternates: dict[str, dict[str, bytes]] = field(default_factory=dict, repr=False)
+
+    @property
+    def content(self) -> bytes:
+        return self.variants.get("identity", b"")
+
+    @property
+    def max_age(self) -> int:
+        return int(self.expires_at - time.time())
+
+    def variants_for(self, media_type: str) -> dict[str, bytes]:
+        """Encoded (and precompressed) forms of the body in `media_type`, built once per result."""
+        if media_type == media.JSON:
+            return self.variants
+        encoded = self.alternates.get(media_type)
+        if encoded is None:
+            encoded = self.alternates[media_type] = compress_variants(media.encode(self.payload(), media_type))
+        return encoded
+
+    def payload(self) -> dict:
+        """The body as JSON-compatible Python data."""
+        return self.body.model_dump(mode="json") if isinstance(self.body, BaseModel) else self.body
+
+
+def _expires_now(source: str) -> bool:
+    return source == "stale" or (source == "mock" and settings.UPSTREAM_MODE != "mock")
+
+
+def _versioned(body: BaseModel | dict, parts: list[UpstreamResult]) -> WeatherResult:
+    """Version a response by its encoded body; freshness follows its upstream components.
+
+    The ETag hashes the JSON bytes, so every parameter that shapes the body (labels, horizon
+    slicing, projection) is covered without listing it.
+
+    Live data (and mock data in UPSTREAM_MODE=mock) stays current until its cache TTL / mock
+    bucket ends. Stale data is already past it, and mock data standing in for a failed upstream
+    should be replaced as soon as it recovers, so clients should revalidate straight away.
+    """
+    now = time.time()
+    expires_at = min(now if _expires_now(p.source) else p.stored_at + CACHE_TTL_SECONDS for p in parts)
+    content = orjson.dumps(body.model_dump() if isinstance(body, BaseModel) else body)
+    return WeatherResult(
+        body=body,
+        etag=content_etag(content),
+        last_modified=max(p.stored_at for p in parts),
+        expires_at=expires_at,
+        variants=compress_variants(content),
+    )
+
+
+def _condition(raw: dict, name: str):
+    return (raw.get("weather") or {}).get(name, "")
+
+
+# Response field -> extractor from a raw WeatherBit row. Shared by the row DTOs and the
+# columnar format so both read upstream data identically.
+_CURRENT_FIELDS: dict[str, Callable[[dict], object]] = {
+    "city_name": lambda d: d.get("city_name", ""),
+    "country_code": lambda d: d.get("country_code", ""),
+    "temp": lambda d: d.get("temp", 0),
+    "feels_like": lambda d: d.get("app_temp", 0),
+    "humidity": lambda d: d.get("rh", 0),
+    "wind_speed": lambda d: d.get("wind_spd", 0),
+    "wind_direction": lambda d: d.get("wind_cdir_full", ""),
+    "description": lambda d: _condition(d, "description"),
+    "icon": lambda d: _condition(d, "icon"),
+    "visibility": lambda d: d.get("vis"),
+    "pressure": lambda d: d.get("pres"),
+    "uv_index": lambda d: d.get("uv"),
+    "clouds": lambda d: d.get("clouds"),
+    "sunrise": lambda d: d.get("sunrise"),
+    "sunset": lambda d: d.get("sunset"),
+    "aqi": lambda d: d.get("aqi"),
+    "lat": lambda d: d.get("lat", 0),
+    "lon": lambda d: d.get("lon", 0),
+}
+
+_DAILY_FIELDS: dict[str, Callable[[dict], object]] = {
+    "date": lambda d: d.get("valid_date", ""),
+    "temp_high": lambda d: d.get("high_temp", d.get("max_temp", 0)),
+    "temp_low": lambda d: d.get("low_temp", d.get("min_temp", 0)),
+    "humidity": lambda d: d.get("rh"),
+    "wind_speed": lambda d: d.get("wind_spd"),
+    "description": lambda d: _condition(d, "description"),
+    "icon": lambda d: _condition(d, "icon"),
+    "pop": lambda d: d.get("pop"),
+}
+
+_HOURLY_FIELDS: dict[str, Callable[[dict], object]] = {
+    "timestamp": lambda h: h.get("timestamp_local", h.get("datetime", "")),
+    "temp": lambda h: h.get("temp", 0),
+    "feels_like": lambda h: h.get("app_temp"),
+    "humidity": lambda h: h.get("rh"),
+    "wind_speed": lambda h: h.get("wind_spd"),
+    "description": lambda h: _condition(h, "description"),
+    "icon": lambda h: _condition(h, "icon"),
+    "pop": lambda h: h.get("pop"),
+}
+
+_ALERT_FIELDS: dict[str, Callable[[dict], object]] = {
+    "title": lambda a: a.get("title", ""),
+    "description": lambda a: a.get("description", ""),
+    "severity": lambda a: a.get("severity"),
+    "expires": lambda a: a.get("expires_local"),
+    "regions": lambda a: a.get("regions", []),
+}
+
+
+# Selectable fields for ?fields= (None: scalar, selected whole)
+CURRENT_SELECTABLE = {"data": tuple(_CURRENT_FIELDS)}
+FORECAST_SELECTABLE = {
+    "city_name": None,
+    "country_code": None,
+    "lat": None,
+    "lon": None,
+    "daily": tuple(_DAILY_FIELDS),
+    "hourly": tuple(_HOURLY_FIELDS),
+    "alerts": tuple(_ALERT_FIELDS),
+}
+
+
+def _row(raw: dict, fields: dict[str, Callable[[dict], object]]) -> dict:
+    return {name: get(raw) for name, get in fields.items()}
+
+
+def _subset(
+    fields: dict[str, Callable[[dict], object]], names: tuple[str, ...] | None
+) -> dict[str, Callable[[dict], object]]:
+    return fields if names is None else {name: fields[name] for name in names}
+
+
+def _columns(
+    rows: list[dict], fields: dict[str, Callable[[dict], object]], conditions: dict[tuple[str, str], int]
+) -> dict[str, list]:
+    """Parallel per-field arrays; description/icon become indexes into a shared conditions table."""
+    columns = {
+        name: [get(r) for r in rows] for name, get in fields.items() if name not in ("description", "icon")
+    }
+    if "description" in fields or "icon" in fields:
+        columns["condition"] = [
+            conditions.setdefault((_condition(r, "description"), _condition(r, "icon")), len(conditions))
+            for r in rows
+        ]
+    return columns
+
+
+def result_memo_stats() -> dict:
+    return _results.stats()
+
+
+def _location_key(city: str | None, lat: float | None, lon: float | None) -> str:
+    if city:
+        return "city:" + " ".join(city.lower().split())
+    if lat is not None and lon is not None:
+        params = coord_params(lat, lon)
+        return f"coord:{params['lat']},{params['lon']}"
+    return "none"
+
+
+def _forecast_key(
+    city: str | None, lat: float | None, lon: float | None, days: int, hours: int, columnar: bool,
+    fields: Selection | None,
+) -> str:
+    layout = "columnar" if columnar else "rows"
+    key = f"forecast:{layout}:{days}:{hours}:" + _location_key(city, lat, lon)
+    if fields is not None:
+        key += ":fields=" + selection_key(fields)
+    return key
+
+
+def _remember_version(key: str, result: WeatherResult) -> None:
+    """Add a forecast version to its query's ring buffer, for later deltas against it."""
+    if settings.FORECAST_DELTA_VERSIONS <= 0:
+        return
+    entry = _versions.get_entry(key, count=False)
+    history = entry.value if entry is not None else deque(maxlen=settings.FORECAST_DELTA_VERSIONS)
+    if any(etag == result.etag for etag, _, _ in history):
+        return
+    history.append((result.etag, result.payload(), len(result.content)))
+    _versions.set(key, history, size=sum(size for _, _, size in history))
+
+
+def _find_version(key: str, etag: str) -> dict | None:
+    entry = _versions.get_entry(key)
+    if entry is None:
+        return None
+    return next((body for version, body, _ in entry.value if version == etag), None)
+
+
+async def _coalesced(key: str, build: Callable[[], Awaitable[WeatherResult]]) -> WeatherResult:
+    """Run `build` once for concurrent identical requests and cache the result while it is fresh."""
+    if settings.WEATHER_RESULT_MEMO_SECONDS <= 0:
+        return await build()
+    cached = _results.get(key)
+    if cached is not None:
+        return cached
+    async with _result_locks.hold(key):
+        cached = _results.get_entry(key, count=False)
+        if cached is not None:
+            return cached.value
+        result = await build()
+        ttl = max(settings.WEATHER_RESULT_MEMO_SECONDS, result.max_age)
+        _results.set(key, result, ttl=ttl, size=sum(len(v) for v in result.variants.values()))
+        return result
+
 
 class WeatherService:
     async def get_current(
         self, city: str | None = None, lat: float | None = None, lon: float | None = None
     ) -> CurrentWeatherResponse:
-        raw, is_mock = await weather_client.get_current_weather(city=city, lat=lat, lon=lon)
+        return (await self.get_current_result(city=city, lat=lat, lon=lon)).body
+
+    async def get_forecast(
+        self,
+        city: str | None = None,
+        lat: float | None = None,
+        lon: float | None = None,
+        days: int = 5,
+        hours: int = 48,
+    ) -> ForecastResponse:
+        return (await self.get_forecast_result(city=city, lat=lat, lon=lon, days=days, hours=hours)).body
+
+    async def get_current_result(
+        self,
+        city: str | None = None,
+        lat: float | None = None,
+        lon: float | None = None,
+        fields: Selection | None = None,
+    ) -> WeatherResult:
+        """Current weather; `fields` (see CURRENT_SELECTABLE) limits `data` to the named fields."""
+        prefetch_scheduler.note_access(city)
+        key = "current:" + _location_key(city, lat, lon)
+        if fields is not None:
+            key += ":fields=" + selection_key(fields)
+        return await _coalesced(key, lambda: self._build_current(city, lat, lon, fields))
+
+    async def get_forecast_result(
+        self,
+        city: str | None = None,
+        lat: float | None = None,
+        lon: float | None = None,
+        days: int = 5,
+        hours: int = 48,
+        columnar: bool = False,
+        fields: Selection | None = None,
+    ) -> WeatherResult:
+        """Forecast as row objects (ForecastResponse) or, with `columnar`, as per-field arrays.
+
+        `fields` (see FORECAST_SELECTABLE) drops unselected fields before anything is built.
+        """
+        prefetch_scheduler.note_access(city)
+        key = _forecast_key(city, lat, lon, days, hours, columnar, fields)
+        if columnar or fields is not None:
+            result = await _coalesced(
+                key, lambda: self._build_forecast_compact(city, lat, lon, days, hours, columnar, fields)
+            )
+        else:
+            result = await _coalesced(key, lambda: self._build_forecast(city, lat, lon, days, hours))
+        if not columnar:
+            _remember_version(key, result)
+        return result
+
+    async def get_forecast_delta(
+        self,
+        since: str,
+        city: str | None = None,
+        lat: float | None = None,
+        lon: float | None = None,
+        days: int = 5,
+        hours: int = 48,
+        fields: Selection | None = None,
+    ) -> tuple[WeatherResult, bool]:
+        """Row-layout forecast changes since version `since` (an ETag the client holds).
+
+        Returns (delta, True) while `since` is among the query's recent versions, otherwise
+        (full forecast, False). A delta lists added / changed / removed daily and hourly rows
+        (keyed by date / timestamp) plus any other fields that changed, under "set".
+        """
+        current = await self.get_forecast_result(city=city, lat=lat, lon=lon, days=days, hours=hours, fields=fields)
+        key = _forecast_key(city, lat, lon, days, hours, False, fields)
+        base = _find_version(key, since)
+        target = _find_version(key, current.etag)
+        if base is None or target is None:
+            return current, False
+
+        async def build() -> WeatherResult:
+            delta = {"from": since, "to": current.etag, **diff_document(base, target, _DELTA_SERIES)}
+            return WeatherResult(
+                body=delta,
+                etag=make_etag(key, "delta", since, current.etag),
+                last_modified=current.last_modified,
+                expires_at=current.expires_at,
+                variants=compress_variants(orjson.dumps(delta)),
+            )
+
+        return await _coalesced(f"{key}:delta={since}>{current.etag}", build), True
+
+    async def _build_current(
+        self, city: str | None, lat: float | None, lon: float | None, fields: Selection | None
+    ) -> WeatherResult:
+        current = await weather_client.get_current_weather(city=city, lat=lat, lon=lon)
+        raw = current.data
         data_list = raw.get("data", [])
         if not data_list:
             from app.core.exceptions import NotFoundError
             raise NotFoundError(detail="No weather data found for the given location")
 
         d = data_list[0]
-        weather_data = CurrentWeatherData(
-            city_name=d.get("city_name", ""),
-            country_code=d.get("country_code", ""),
-            temp=d.get("temp", 0),
-            feels_like=d.get("app_temp", 0),
-            humidity=d.get("rh", 0),
-            wind_speed=d.get("wind_spd", 0),
-            wind_direction=d.get("wind_cdir_full", ""),
-            description=d.get("weather", {}).get("description", ""),
-            icon=d.get("weather", {}).get("icon", ""),
-            visibility=d.get("vis"),
-            pressure=d.get("pres"),
-            uv_index=d.get("uv"),
-            clouds=d.get("clouds"),
-            sunrise=d.get("sunrise"),
-            sunset=d.get("sunset"),
-            aqi=d.get("aqi"),
-            lat=d.get("lat", 0),
-            lon=d.get("lon", 0),
-        )
-        return CurrentWeatherResponse(
-            data=weather_data,
-            data_source="mock" if is_mock else "live",
-        )
+        if fields is not None:
+            body = {"data": _row(d, _subset(_CURRENT_FIELDS, fields["data"])), "data_source": current.source}
+        else:
+            body = CurrentWeatherResponse(
+                data=CurrentWeatherData(**_row(d, _CURRENT_FIELDS)),
+                data_source=current.source,
+            )
+        return _versioned(body, [current])
 
-    async def get_forecast(
-        self, city: str | None = None, lat: float | None = None, lon: float | None = None
-    ) -> ForecastResponse:
-        (daily_raw, daily_mock), (hourly_raw, hourly_mock) = await asyncio.gather(
-            weather_client.get_forecast_daily(city=city, lat=lat, lon=lon, days=5),
-            weather_client.get_forecast_hourly(city=city, lat=lat, lon=lon, hours=48),
-        )
+    async def _fetch_forecast(
+        self, city: str | None, lat: float | None, lon: float | None, days: int, hours: int
+    ) -> list[UpstreamResult]:
+        """Upstream [daily, hourly, alerts?] for a forecast, fetched as concurrently as possible."""
+        # Resolve the location once, then fetch every component concurrently
+        location = await weather_client.resolve_location(city=city, lat=lat, lon=lon)
+        coordinates = location.coordinates
+        fetches = [
+            weather_client.get_forecast_daily(city=city, lat=lat, lon=lon, days=days, location=location),
+            weather_client.get_forecast_hourly(city=city, lat=lat, lon=lon, hours=hours, location=location),
+        ]
+        if coordinates:
+            fetches.append(weather_client.get_alerts(lat=coordinates[0], lon=coordinates[1]))
+        parts = list(await asyncio.gather(*fetches))
 
-        daily_list = []
-        for d in daily_raw.get("data", []):
-            daily_list.append(DailyForecast(
-                date=d.get("valid_date", ""),
-                temp_high=d.get("high_temp", d.get("max_temp", 0)),
-                temp_low=d.get("low_temp", d.get("min_temp", 0)),
-                humidity=d.get("rh"),
-                wind_speed=d.get("wind_spd"),
-                description=d.get("weather", {}).get("description", ""),
-                icon=d.get("weather", {}).get("icon", ""),
-                pop=d.get("pop"),
-            ))
-
-        hourly_list = []
-        for h in hourly_raw.get("data", []):
-            hourly_list.append(HourlyForecast(
-                timestamp=h.get("timestamp_local", h.get("datetime", "")),
-                temp=h.get("temp", 0),
-                feels_like=h.get("app_temp"),
-                humidity=h.get("rh"),
-                wind_speed=h.get("wind_spd"),
-                description=h.get("weather", {}).get("description", ""),
-                icon=h.get("weather", {}).get("icon", ""),
-                pop=h.get("pop"),
-            ))
-
-        city_name = daily_raw.get("city_name", "")
-        country_code = daily_raw.get("country_code", "")
-        lat_val = daily_raw.get("lat", 0)
-        lon_val = daily_raw.get("lon", 0)
-
-        # Fetch alerts if we have coordinates
-        alerts_list: list[WeatherAlert] = []
-        alerts_mock = False
-        if lat_val and lon_val:
-            alerts_raw, alerts_mock = await weather_client.get_alerts(lat=lat_val, lon=lon_val)
-            for a in alerts_raw.get("alerts", []):
-                alerts_list.append(WeatherAlert(
-                    title=a.get("title", ""),
-                    description=a.get("description", ""),
-                    severity=a.get("severity"),
-                    expires=a.get("expires_local"),
-                    regions=a.get("regions", []),
-                ))
-
-        is_mock = daily_mock or hourly_mock or alerts_mock
-
-        return ForecastResponse(
-            city_name=city_name,
-            country_code=country_code,
-            lat=lat_val,
-            lon=lon_val,
-            daily=daily_list,
-            hourly=hourly_list,
-            alerts=alerts_list,
-            data_source="mock" if is_mock else "live",
+        # Without resolved coordinates (default city) alerts wait for the forecast's lat/lon
+        daily_raw = parts[0].data
+        if not coordinates and daily_raw.get("lat") and daily_raw.get("lon"):
+            parts.append(await weather_client.get_alerts(lat=daily_raw["lat"], lon=daily_raw["lon"]))
+        return parts
+
+    async def _build_forecast(
+        self, city: str | None, lat: float | None, lon: float | None, days: int, hours: int
+    ) -> WeatherResult:
+        parts = await self._fetch_forecast(city, lat, lon, days, hours)
+        daily_raw, hourly_raw = parts[0].data, parts[1].data
+        alerts_raw = parts[2].data if len(parts) > 2 else {}
+
+        body = ForecastResponse(
+            city_name=daily_raw.get("city_name", ""),
+            country_code=daily_raw.get("country_code", ""),
+            lat=daily_raw.get("lat", 0),
+            lon=daily_raw.get("lon", 0),
+            daily=[DailyForecast(**_row(d, _DAILY_FIELDS)) for d in daily_raw.get("data", [])],
+            hourly=[HourlyForecast(**_row(h, _HOURLY_FIELDS)) for h in hourly_raw.get("data", [])],
+            alerts=[WeatherAlert(**_row(a, _ALERT_FIELDS)) for a in alerts_raw.get("alerts", [])],
+            data_source=_combined_source(*(p.source for p in parts)),
         )
+        return _versioned(body, parts)
+
+    async def _build_forecast_compact(
+        self,
+        city: str | None,
+        lat: float | None,
+        lon: float | None,
+        days: int,
+        hours: int,
+        columnar: bool,
+        fields: Selection | None,
+    ) -> WeatherResult:
+        """Columnar and/or projected forecast, assembled as plain dicts without per-row models."""
+        parts = await self._fetch_forecast(city, lat, lon, days, hours)
+        daily_raw, hourly_raw = parts[0].data, parts[1].data
+        alerts_raw = parts[2].data if len(parts) > 2 else {}
+        selection = fields if fields is not None else dict.fromkeys(FORECAST_SELECTABLE)
+
+        conditions: dict[tuple[str, str], int] = {}
+        body: dict = {}
+        for name, subs in selection.items():
+            if name in ("daily", "hourly"):
+                rows = (daily_raw if name == "daily" else hourly_raw).get("data", [])
+                table = _subset(_DAILY_FIELDS if name == "daily" else _HOURLY_FIELDS, subs)
+                body[name] = _columns(rows, table, conditions) if columnar else [_row(r, table) for r in rows]
+            elif name == "alerts":
+                table = _subset(_ALERT_FIELDS, subs)
+                body[name] = [_row(a, table) for a in alerts_raw.get("alerts", [])]
+            else:
+                body[name] = daily_raw.get(name, "" if name in ("city_name", "country_code") else 0)
+        if conditions or (columnar and fields is None):
+            body["conditions"] = [{"description": d, "icon": i} for d, i in conditions]
+        body["data_source"] = _combined_source(*(p.source for p in parts))
+        return _versioned(body, parts)
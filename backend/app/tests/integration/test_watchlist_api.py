@@ -1,3 +1,5 @@
+import cbor2
+import msgpack
 import pytest
 from httpx import AsyncClient
 
@@ -21,6 +23,19 @@ class TestWatchlistAPI:
         data = response.json()
         assert data["location"]["city_name"] == "Paris"
 
+    async def test_binary_encodings_follow_accept(self, client: AsyncClient, auth_headers):
+        created = await client.post(
+            "/api/v1/watchlist",
+            headers={**auth_headers, "Accept": "application/cbor"},
+            json={"city_name": "Oslo", "country_code": "NO"},
+        )
+        listed = await client.get("/api/v1/watchlist", headers={**auth_headers, "Accept": "application/msgpack"})
+
+        assert created.status_code == 201
+        assert cbor2.loads(created.content)["location"]["city_name"] == "Oslo"
+        assert listed.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(listed.content)["count"] == 1
+
     async def test_add_duplicate_to_watchlist(self, client: AsyncClient, auth_headers):
         await client.post(
             "/api/v1/watchlist",
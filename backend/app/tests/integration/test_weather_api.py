@@ -0,0 +1,180 @@
+import msgpack
+import pytest
+from httpx import AsyncClient
+
+from app.core.config import settings
+from app.services import weather_service
+from app.utils.conditional import base_etag
+
+
+@pytest.fixture(autouse=True)
+def mock_upstream(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_MODE", "mock")
+    weather_service._results.clear()
+    weather_service._versions.clear()
+
+
+@pytest.mark.asyncio
+class TestWeatherAPI:
+    async def test_current_weather_sets_validators(self, client: AsyncClient, auth_headers):
+        response = await client.get("/api/v1/weather/current", params={"city": "London"}, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith('"')
+        assert response.headers["cache-control"].startswith("public, max-age=")
+        assert "last-modified" in response.headers
+        assert response.json()["data"]["city_name"] == "London"
+
+    async def test_openapi_keeps_response_models(self, client: AsyncClient):
+        schema = (await client.get("/openapi.json")).json()
+
+        ok = schema["paths"]["/api/v1/weather/forecast"]["get"]["responses"]["200"]
+        assert ok["content"]["application/json"]["schema"]["$ref"].endswith("/ForecastResponse")
+
+    async def test_matching_etag_returns_304(self, client: AsyncClient, auth_headers):
+        first = await client.get("/api/v1/weather/forecast", params={"city": "London"}, headers=auth_headers)
+
+        second = await client.get(
+            "/api/v1/weather/forecast",
+            params={"city": "London"},
+            headers={**auth_headers, "If-None-Match": first.headers["etag"]},
+        )
+
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["etag"] == first.headers["etag"]
+
+    async def test_forecast_is_served_precompressed(self, client: AsyncClient, auth_headers):
+        plain = await client.get(
+            "/api/v1/weather/forecast",
+            params={"city": "London"},
+            headers={**auth_headers, "Accept-Encoding": "identity"},
+        )
+        gzipped = await client.get(
+            "/api/v1/weather/forecast",
+            params={"city": "London"},
+            headers={**auth_headers, "Accept-Encoding": "gzip"},
+        )
+
+        assert "content-encoding" not in plain.headers
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert gzipped.json() == plain.json()
+        assert gzipped.headers["etag"] != plain.headers["etag"]
+        assert "Accept-Encoding" in gzipped.headers["vary"]
+
+    async def test_columnar_forecast_matches_row_format(self, client: AsyncClient, auth_headers):
+        rows = await client.get("/api/v1/weather/forecast", params={"city": "London"}, headers=auth_headers)
+        columnar = await client.get(
+            "/api/v1/weather/forecast",
+            params={"city": "London"},
+            headers={**auth_headers, "Accept": "application/vnd.weather.columnar+json"},
+        )
+
+        assert columnar.headers["content-type"] == "application/vnd.weather.columnar+json"
+        assert columnar.headers["etag"] != rows.headers["etag"]
+        hourly, table = columnar.json()["hourly"], columnar.json()["conditions"]
+        first = rows.json()["hourly"][0]
+        assert hourly["temp"][0] == first["temp"]
+        assert table[hourly["condition"][0]] == {"description": first["description"], "icon": first["icon"]}
+        assert len(hourly["timestamp"]) == len(rows.json()["hourly"]) == 48
+
+    async def test_format_query_selects_columnar(self, client: AsyncClient, auth_headers):
+        response = await client.get(
+            "/api/v1/weather/forecast", params={"city": "London", "format": "columnar"}, headers=auth_headers
+        )
+
+        assert isinstance(response.json()["daily"]["date"], list)
+
+    async def test_columnar_refused_with_q_zero_returns_rows(self, client: AsyncClient, auth_headers):
+        response = await client.get(
+            "/api/v1/weather/forecast",
+            params={"city": "London"},
+            headers={**auth_headers, "Accept": "application/vnd.weather.columnar+json;q=0, application/json"},
+        )
+
+        assert response.headers["content-type"] == "application/json"
+        assert isinstance(response.json()["daily"], list)
+
+    async def test_fields_project_current_weather(self, client: AsyncClient, auth_headers):
+        response = await client.get(
+            "/api/v1/weather/current",
+            params={"city": "London", "fields": "temp,icon,description"},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 200
+        assert set(response.json()["data"]) == {"temp", "icon", "description"}
+        assert response.json()["data_source"] == "mock"
+
+    async def test_fields_project_forecast_rows_and_columns(self, client: AsyncClient, auth_headers):
+        params = {"city": "London", "fields": "city_name,hourly.temp"}
+        rows = await client.get("/api/v1/weather/forecast", params=params, headers=auth_headers)
+        columns = await client.get(
+            "/api/v1/weather/forecast", params={**params, "format": "columnar"}, headers=auth_headers
+        )
+
+        assert set(rows.json()) == {"city_name", "hourly", "data_source"}
+        assert set(rows.json()["hourly"][0]) == {"temp"}
+        assert set(columns.json()["hourly"]) == {"temp"}
+
+    async def test_unknown_field_is_rejected(self, client: AsyncClient, auth_headers):
+        response = await client.get(
+            "/api/v1/weather/forecast", params={"city": "London", "fields": "hourly.aqi"}, headers=auth_headers
+        )
+
+        assert response.status_code == 422
+
+    async def test_msgpack_carries_the_json_schema(self, client: AsyncClient, auth_headers):
+        params = {"city": "London"}
+        as_json = await client.get("/api/v1/weather/current", params=params, headers=auth_headers)
+        packed = await client.get(
+            "/api/v1/weather/current", params=params, headers={**auth_headers, "Accept": "application/msgpack"}
+        )
+
+        assert packed.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(packed.content) == as_json.json()
+        assert packed.headers["etag"] != as_json.headers["etag"]
+        assert "Accept" in packed.headers["vary"]
+
+    async def test_since_returns_a_delta_or_the_full_forecast(self, client: AsyncClient, auth_headers):
+        url, params = "/api/v1/weather/forecast", {"city": "London"}
+        full = await client.get(url, params=params, headers=auth_headers)
+        delta = await client.get(url, params={**params, "since": full.headers["etag"]}, headers=auth_headers)
+        unknown = await client.get(url, params={**params, "since": '"0000"'}, headers=auth_headers)
+
+        assert delta.headers["content-type"] == "application/vnd.weather.delta+json"
+        version = base_etag(full.headers["etag"])  # client holds the compressed variant's tag
+        assert delta.json() == {"from": version, "to": version}
+        assert unknown.headers["content-type"] == "application/json"
+        assert unknown.json() == full.json()
+
+    async def test_days_past_the_hourly_horizon_are_rejected_in_daily_from_hourly_mode(
+        self, client: AsyncClient, auth_headers, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "FORECAST_DAILY_FROM_HOURLY", True)
+        url = "/api/v1/weather/forecast"
+
+        ok = await client.get(url, params={"city": "London", "days": 5}, headers=auth_headers)
+        too_far = await client.get(url, params={"city": "London", "days": 6}, headers=auth_headers)
+
+        assert ok.status_code == 200
+        assert too_far.status_code == 422
+
+    async def test_since_is_rejected_for_columnar(self, client: AsyncClient, auth_headers):
+        response = await client.get(
+            "/api/v1/weather/forecast", params={"city": "London", "format": "columnar", "since": '"x"'},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 422
+
+    async def test_other_horizon_has_its_own_etag(self, client: AsyncClient, auth_headers):
+        five = await client.get("/api/v1/weather/forecast", params={"city": "London"}, headers=auth_headers)
+        seven = await client.get(
+            "/api/v1/weather/forecast",
+            params={"city": "London", "days": 7},
+            headers={**auth_headers, "If-None-Match": five.headers["etag"]},
+        )
+
+        assert seven.status_code == 200
+        assert len(seven.json()["daily"]) == 7
@@ -0,0 +1,118 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.utils.cache import KeyedLocks, SQLiteCacheBackend, TTLCache
+
+
+class TestTTLCache:
+
+    def test_lru_eviction_by_entry_count(self):
+        cache = TTLCache(ttl=60, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" becomes least recently used
+        cache.set("c", 3)
+
+        assert "b" not in cache
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_eviction_by_byte_budget(self):
+        cache = TTLCache(ttl=60, max_entries=100, max_bytes=10)
+        cache.set("a", "x", size=6)
+        cache.set("b", "y", size=6)
+
+        assert len(cache) == 1
+        assert cache.stats()["bytes"] == 6
+
+    def test_expired_entries_are_swept_without_being_read(self):
+        cache = TTLCache(ttl=0.01, max_entries=100, sweep_interval=0)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        cache.set("b", 2, ttl=60)
+
+        assert len(cache) == 1
+        assert cache.stats()["expirations"] == 1
+
+    def test_hit_and_miss_counters(self):
+        cache = TTLCache(ttl=60)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("missing")
+
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+class TestSQLiteCacheBackend:
+
+    def test_entries_are_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        worker_a = SQLiteCacheBackend(path, "weather", ttl=60)
+        worker_b = SQLiteCacheBackend(path, "weather", ttl=60)
+
+        worker_a.set("k", {"temp": 12.5})
+
+        assert worker_b.get("k") == {"temp": 12.5}
+        assert SQLiteCacheBackend(path, "geocode", ttl=60).get("k") is None
+
+    def test_negative_results_are_distinguishable_from_misses(self, tmp_path):
+        cache = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), "geocode", ttl=60)
+        cache.set("city:nowhere", None)
+
+        assert cache.get_entry("city:nowhere").value is None
+        assert cache.get_entry("city:elsewhere") is None
+
+    def test_sweep_enforces_entry_limit_and_expiry(self, tmp_path):
+        cache = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), "weather", ttl=60, max_entries=2)
+        cache.set("expired", 0, ttl=-1)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+            time.sleep(0.001)
+
+        cache.sweep()
+
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert (stats["expirations"], stats["evictions"]) == (1, 1)
+        assert cache.get("a") is None
+
+    @pytest.mark.asyncio
+    async def test_async_calls_wait_for_a_busy_writer_off_the_event_loop(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        cache = SQLiteCacheBackend(path, "weather", ttl=60)
+        other_worker = sqlite3.connect(path, isolation_level=None)
+        other_worker.execute("BEGIN IMMEDIATE")  # holds the write lock
+
+        write = asyncio.create_task(cache.aset("k", {"temp": 15}))
+        ticks = 0
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert ticks == 5 and not write.done()
+
+        other_worker.execute("COMMIT")
+        await write
+        assert (await cache.aget_entry("k")).value == {"temp": 15}
+        other_worker.close()
+
+
+@pytest.mark.asyncio
+class TestKeyedLocks:
+
+    async def test_lock_is_released_when_unused(self):
+        locks = KeyedLocks()
+        order = []
+
+        async def worker(n):
+            async with locks.hold("k"):
+                order.append(n)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(worker(1), worker(2))
+
+        assert order == [1, 2]
+        assert len(locks) == 0
@@ -0,0 +1,61 @@
+import time
+
+from app.utils.circuit_breaker import CircuitBreaker, CircuitState
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+        breaker.record_failure()
+        assert breaker.allow_request()
+
+        breaker.record_failure()
+
+        assert breaker.state is CircuitState.OPEN
+        assert not breaker.allow_request()
+        assert breaker.snapshot()["rejected"] == 1
+
+    def test_half_open_probe_closes_on_success(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        assert breaker.state is CircuitState.HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()  # only one probe at a time
+
+        breaker.record_success()
+        assert breaker.state is CircuitState.CLOSED
+
+    def test_half_open_probe_failure_reopens(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=0.01)
+        for _ in range(3):
+            breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.allow_request()
+
+        breaker.record_failure()
+
+        assert breaker.state is CircuitState.OPEN
+
+    def test_status_codes_are_classified(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=60)
+        for status in (403, 429, 503):
+            breaker.record_status(status)
+
+        assert breaker.state is CircuitState.OPEN
+
+    def test_caller_error_neither_opens_nor_closes(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.01)
+        breaker.record_status(400)
+        breaker.record_status(404)
+        assert breaker.state is CircuitState.CLOSED
+
+        breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.allow_request()
+        breaker.record_status(404)
+
+        assert breaker.state is CircuitState.HALF_OPEN
+        assert breaker.allow_request()  # the probe slot was released
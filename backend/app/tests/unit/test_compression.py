@@ -0,0 +1,30 @@
+import gzip
+
+from app.core.config import settings
+from app.utils.compression import compress_variants, negotiate_encoding
+
+PAYLOAD = b'{"hourly":[' + b",".join(b'{"temp":12.5,"description":"Few clouds"}' for _ in range(48)) + b"]}"
+
+
+class TestCompression:
+    def test_large_payloads_get_compressed_variants(self):
+        variants = compress_variants(PAYLOAD)
+
+        assert variants["identity"] is PAYLOAD
+        assert gzip.decompress(variants["gzip"]) == PAYLOAD
+        assert len(variants["gzip"]) < len(PAYLOAD)
+
+    def test_small_payloads_stay_identity_only(self):
+        assert compress_variants(b"x" * (settings.RESPONSE_COMPRESSION_MIN_BYTES - 1)).keys() == {"identity"}
+
+    def test_negotiation_prefers_brotli_then_gzip(self):
+        variants = {"identity": b"", "gzip": b"", "br": b""}
+
+        assert negotiate_encoding("gzip, deflate, br", variants) == "br"
+        assert negotiate_encoding("gzip, br;q=0.5", variants) == "gzip"
+        assert negotiate_encoding("deflate", variants) == "identity"
+        assert negotiate_encoding(None, variants) == "identity"
+
+    def test_negotiation_only_offers_available_variants(self):
+        assert negotiate_encoding("br, gzip", {"identity": b""}) == "identity"
+        assert negotiate_encoding("*", {"identity": b"", "gzip": b""}) == "gzip"
@@ -0,0 +1,36 @@
+from app.utils.conditional import base_etag, cache_headers, http_date, is_not_modified, make_etag, variant_etag
+
+
+class TestConditional:
+    def test_etag_is_stable_and_version_sensitive(self):
+        assert make_etag("current:city:london", 100.0) == make_etag("current:city:london", 100.0)
+        assert make_etag("current:city:london", 100.0) != make_etag("current:city:london", 400.0)
+
+    def test_if_none_match_uses_weak_comparison(self):
+        etag = make_etag("k", 1)
+        assert is_not_modified({"if-none-match": f'"other", W/{etag}'}, etag, 0)
+        assert is_not_modified({"if-none-match": "*"}, etag, 0)
+        assert not is_not_modified({"if-none-match": '"other"'}, etag, 0)
+
+    def test_if_none_match_takes_precedence_over_if_modified_since(self):
+        headers = {"if-none-match": '"other"', "if-modified-since": http_date(2000)}
+        assert not is_not_modified(headers, make_etag("k", 1), 1000)
+
+    def test_if_modified_since(self):
+        assert is_not_modified({"if-modified-since": http_date(1000)}, '"x"', 1000.7)
+        assert not is_not_modified({"if-modified-since": http_date(1000)}, '"x"', 1001)
+        assert not is_not_modified({"if-modified-since": "garbage"}, '"x"', 0)
+
+    def test_cache_headers_clamp_negative_max_age(self):
+        headers = cache_headers('"x"', 0, -5)
+        assert headers["Cache-Control"] == "public, max-age=0"
+        assert headers["Last-Modified"] == "Thu, 01 Jan 1970 00:00:00 GMT"
+
+    def test_variant_etags_differ_per_media_type_and_coding(self):
+        assert variant_etag('"abc"', "identity") == '"abc"'
+        assert variant_etag('"abc"', "gzip") == '"abc-gzip"'
+        assert variant_etag('"abc"', "br", form="application/msgpack") == '"abc-msgpack-br"'
+
+    def test_base_etag_strips_weak_prefix_and_variant_suffix(self):
+        assert base_etag('W/"abc-msgpack-br"') == '"abc"'
+        assert base_etag('"abc"') == '"abc"'
@@ -0,0 +1,25 @@
+from app.utils.delta import diff_document, diff_rows
+
+SERIES = {"hourly": "timestamp"}
+
+
+class TestDelta:
+    def test_rows_are_matched_by_id(self):
+        old = [{"timestamp": "10", "temp": 1}, {"timestamp": "11", "temp": 2}]
+        new = [{"timestamp": "11", "temp": 3}, {"timestamp": "12", "temp": 4}]
+
+        assert diff_rows(old, new, "timestamp") == {
+            "added": [{"timestamp": "12", "temp": 4}],
+            "changed": [{"timestamp": "11", "temp": 3}],
+            "removed": ["10"],
+        }
+
+    def test_rows_without_ids_fall_back_to_position(self):
+        assert diff_rows([{"temp": 1}], [{"temp": 1}, {"temp": 2}], "timestamp")["added"] == [{"temp": 2}]
+
+    def test_other_fields_are_sent_only_when_they_change(self):
+        old = {"city_name": "London", "data_source": "stale", "hourly": [{"timestamp": "10"}], "alerts": []}
+        new = {"city_name": "London", "data_source": "live", "hourly": [{"timestamp": "10"}]}
+
+        assert diff_document(old, new, SERIES) == {"set": {"data_source": "live"}, "unset": ["alerts"]}
+        assert diff_document(new, new, SERIES) == {}
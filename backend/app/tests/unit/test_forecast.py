@@ -0,0 +1,56 @@
+from app.utils.forecast import daily_from_hourly
+
+
+def _hour(stamp: str, temp: float, code: int = 800, pop: int = 0, rh: int = 50, wind: float = 2.0) -> dict:
+    return {
+        "timestamp_local": stamp,
+        "temp": temp,
+        "rh": rh,
+        "wind_spd": wind,
+        "pop": pop,
+        "weather": {"code": code, "description": f"code {code}", "icon": f"i{code}"},
+    }
+
+
+class TestDailyFromHourly:
+    def test_aggregates_each_local_date(self):
+        rows = [
+            _hour("2025-01-15T03:00:00", 2.0, code=741, rh=90, wind=1.0),
+            _hour("2025-01-15T09:00:00", 6.5, code=500, pop=60, rh=70, wind=3.0),
+            _hour("2025-01-15T14:00:00", 9.0, code=500, pop=40, rh=60, wind=5.0),
+            _hour("2025-01-16T12:00:00", 11.0),
+            _hour("2025-01-16T23:00:00", 7.0),
+        ]
+
+        first, second = daily_from_hourly(rows, days=5)
+
+        assert first["valid_date"] == "2025-01-15"
+        assert (first["high_temp"], first["low_temp"]) == (9.0, 2.0)
+        assert (first["rh"], first["wind_spd"], first["pop"]) == (73, 3.0, 60)
+        assert first["weather"]["code"] == 500
+        assert second["valid_date"] == "2025-01-16"
+
+    def test_daytime_condition_wins_over_night(self):
+        rows = [_hour(f"2025-01-15T{h:02d}:00:00", 5.0, code=741) for h in range(6)]
+        rows.append(_hour("2025-01-15T12:00:00", 8.0, code=800))
+
+        (day,) = daily_from_hourly(rows, days=1)
+
+        assert day["weather"]["code"] == 800
+
+    def test_stops_at_requested_days(self):
+        rows = [_hour(f"2025-01-{d:02d}T12:00:00", 5.0) for d in range(10, 20)]
+
+        assert [d["valid_date"] for d in daily_from_hourly(rows, days=3)] == [
+            "2025-01-10", "2025-01-11", "2025-01-12",
+        ]
+
+    def test_mid_day_start_keeps_today_and_drops_the_cut_off_last_day(self):
+        rows = [_hour(f"2025-01-{15 + (13 + i) // 24}T{(13 + i) % 24:02d}:00:00", 5.0) for i in range(120)]
+
+        days = daily_from_hourly(rows, days=16)
+
+        assert [d["valid_date"] for d in days] == [
+            "2025-01-15", "2025-01-16", "2025-01-17", "2025-01-18", "2025-01-19",
+        ]
+        assert [d["hours"] for d in days] == [11, 24, 24, 24, 24]
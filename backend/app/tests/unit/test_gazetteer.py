@@ -0,0 +1,128 @@
+import pytest
+
+from app.core.config import settings
+from app.services import gazetteer as gazetteer_module
+from app.services import geocoding
+from app.services.gazetteer import Gazetteer, fold
+
+ROWS = [
+    {"name": "Zürich", "countrycode": "CH", "latitude": 47.37, "longitude": 8.55, "population": 341730,
+     "alternatenames": ["Zurich", "Zuerich", "Цюрих"]},
+    {"name": "Bengaluru", "countrycode": "IN", "latitude": 12.97, "longitude": 77.59, "population": 5104047,
+     "alternatenames": ["Bangalore"]},
+    {"name": "Paris", "countrycode": "FR", "latitude": 48.85, "longitude": 2.35, "population": 2138551,
+     "alternatenames": []},
+    {"name": "Paris", "countrycode": "US", "latitude": 33.66, "longitude": -95.56, "population": 24782,
+     "alternatenames": []},
+    {"name": "Şile", "countrycode": "TR", "latitude": 41.18, "longitude": 29.61, "population": 25169,
+     "alternatenames": ["Chile"]},
+    {"name": "Florida", "countrycode": "CU", "latitude": 21.53, "longitude": -78.23, "population": 63007,
+     "alternatenames": []},
+    {"name": "Tuscany", "countrycode": "CA", "latitude": 51.12, "longitude": -114.2, "population": 19700,
+     "alternatenames": []},
+    {"name": "Singapore", "countrycode": "SG", "latitude": 1.29, "longitude": 103.85, "population": 5638700,
+     "alternatenames": []},
+]
+REGIONS = {"Chile": "Santiago", "Singapore": "Singapore", "Florida": None, "Tuscany": None}
+
+
+class TestGazetteer:
+
+    def test_fold_ignores_case_accents_and_punctuation(self):
+        assert fold("  São   Paulo ") == "sao paulo"
+        assert fold("St. John's") == "st johns"
+        assert fold("Winston-Salem") == "winston salem"
+        assert fold("MÜNCHEN") == "munchen"
+
+    def test_exact_and_accent_insensitive_lookup(self):
+        g = Gazetteer().build(ROWS)
+
+        assert g.lookup("Zürich") == {"city": "Zürich", "country": "CH", "lat": 47.37, "lon": 8.55}
+        assert g.lookup("zurich")["country"] == "CH"
+        assert g.lookup("SILE")["country"] == "TR"
+
+    def test_latin_alternate_names_resolve(self):
+        g = Gazetteer().build(ROWS, REGIONS)
+
+        assert g.lookup("Zuerich")["city"] == "Zürich"
+        assert g.lookup("bangalore")["city"] == "Bengaluru"
+        assert g.lookup("Цюрих") is None
+        # Şile's alias is a country name
+        assert g.lookup("Chile") is None
+
+    def test_primary_name_beats_an_alias(self):
+        rows = [*ROWS, {"name": "Tokyo", "countrycode": "JP", "latitude": 35.69, "longitude": 139.69,
+                        "population": 8336599, "alternatenames": ["Paris"]}]
+
+        assert Gazetteer().build(rows).lookup("Paris")["country"] == "FR"
+
+    def test_country_and_region_names_are_left_to_the_geocoder(self):
+        g = Gazetteer().build(ROWS, REGIONS)
+
+        assert g.lookup("Florida") is None
+        assert g.lookup("tuscany") is None
+        # A city-state's capital keeps the country's name
+        assert g.lookup("Singapore")["country"] == "SG"
+
+    def test_larger_population_wins_a_shared_name(self):
+        assert Gazetteer().build(ROWS).lookup("paris")["country"] == "FR"
+
+    def test_primary_name_is_indexed(self):
+        assert Gazetteer().build(ROWS).lookup("Bengaluru")["country"] == "IN"
+
+    def test_nearest_city_within_radius(self):
+        g = Gazetteer().build(ROWS)
+
+        assert g.nearest(48.87, 2.33, max_km=10) == {"city": "Paris", "country": "FR"}
+        assert g.nearest(45.0, 5.0, max_km=10) is None
+
+    def test_empty_index_misses(self):
+        g = Gazetteer()
+
+        assert not g.loaded
+        assert g.lookup("Paris") is None
+        assert g.nearest(48.85, 2.35, max_km=10) is None
+
+    @pytest.mark.skipif(gazetteer_module.geonamescache is None, reason="geonamescache not installed")
+    def test_loads_geonames_cities(self):
+        g = Gazetteer()
+
+        assert g.load()
+        assert len(g) > 20000
+        assert g.lookup("mumbai")["city"] == "Mumbai"
+        assert g.lookup("bombay")["city"] == "Mumbai"
+        for region in ("Ireland", "Chile", "India", "Bali", "Florida", "Virginia", "Mexico", "Colorado", "Tuscany"):
+            assert g.lookup(region) is None, region
+
+
+@pytest.mark.asyncio
+class TestValidateCityUsesGazetteer:
+
+    async def test_known_city_skips_nominatim(self, monkeypatch, httpx_mock):
+        monkeypatch.setattr(settings, "UPSTREAM_MODE", "live")
+        monkeypatch.setattr(geocoding, "gazetteer", Gazetteer().build(ROWS))
+
+        result = await geocoding.validate_city("zurich")
+
+        assert result["city"] == "Zürich"
+        assert httpx_mock.get_requests() == []
+
+    async def test_region_name_goes_to_nominatim(self, monkeypatch, httpx_mock):
+        monkeypatch.setattr(settings, "UPSTREAM_MODE", "live")
+        monkeypatch.setattr(settings, "GEOCODE_DB_ENABLED", False)
+        monkeypatch.setattr(geocoding, "gazetteer", Gazetteer().build(ROWS, REGIONS))
+        monkeypatch.setattr(geocoding, "nominatim", geocoding.NominatimClient())
+        httpx_mock.add_response(json=[{"lat": "27.99", "lon": "-81.76", "address": {"country_code": "us"}}])
+
+        result = await geocoding.validate_city("Florida")
+
+        assert result["country"] == "US"
+        assert len(httpx_mock.get_requests()) == 1
+        await geocoding.nominatim.aclose()
+
+    async def test_reverse_near_known_city_skips_nominatim(self, monkeypatch, httpx_mock):
+        monkeypatch.setattr(settings, "UPSTREAM_MODE", "live")
+        monkeypatch.setattr(geocoding, "gazetteer", Gazetteer().build(ROWS))
+
+        assert await geocoding.reverse_geocode(12.93, 77.62) == {"city": "Bengaluru", "country": "IN"}
+        assert httpx_mock.get_requests() == []
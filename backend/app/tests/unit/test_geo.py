@@ -0,0 +1,33 @@
+from unittest.mock import patch
+
+from app.utils.geo import coord_params, geohash_center, geohash_encode
+
+
+class TestCoordinateQuantization:
+
+    def test_equivalent_spellings_share_a_key(self):
+        assert coord_params(51.5, -0.12) == coord_params(51.50, -0.120000001)
+
+    @patch("app.utils.geo.settings")
+    def test_grid_snaps_nearby_points_to_one_cell(self, mock_settings):
+        mock_settings.COORD_QUANTIZATION = "grid"
+        mock_settings.COORD_GRID_DEGREES = 0.02
+
+        assert coord_params(51.507351, -0.127758) == coord_params(51.503112, -0.124004)
+        assert coord_params(51.507351, -0.127758) == {"lat": "51.5", "lon": "-0.12"}
+
+    @patch("app.utils.geo.settings")
+    def test_grid_wraps_antimeridian(self, mock_settings):
+        mock_settings.COORD_QUANTIZATION = "grid"
+        mock_settings.COORD_GRID_DEGREES = 0.02
+
+        assert coord_params(0.0, 179.999)["lon"] == "-180"
+
+    @patch("app.utils.geo.settings")
+    def test_geohash_mode_uses_cell_centre(self, mock_settings):
+        mock_settings.COORD_QUANTIZATION = "geohash"
+        mock_settings.COORD_GEOHASH_PRECISION = 5
+
+        lat, lon = geohash_center(geohash_encode(51.5074, -0.1278, 5))
+        assert geohash_encode(51.5074, -0.1278, 5) == "gcpvj"
+        assert coord_params(51.5074, -0.1278) == coord_params(lat, lon)
@@ -0,0 +1,168 @@
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.exceptions import GeocodingUnavailableError
+from app.models.location import Location
+from app.repositories.location_repository import LocationRepository
+from app.services import geocoding
+from app.services.geocode_store import GeocodeStore
+from app.services.geocoding import NominatimClient
+from app.tests.conftest import TestingSessionLocal
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.rate_limit import UpstreamLimiter
+
+SEARCH_RESULT = [{"lat": "59.91", "lon": "10.75", "address": {"city": "Oslo", "country_code": "no"}}]
+
+
+@pytest.fixture
+def nominatim(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_MODE", "live")
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "memory")
+    client = NominatimClient(store=GeocodeStore(TestingSessionLocal))
+    monkeypatch.setattr(geocoding, "nominatim", client)
+    monkeypatch.setattr(geocoding, "breaker", CircuitBreaker("nominatim-test", failure_threshold=100))
+    return client
+
+
+@pytest.mark.asyncio
+class TestGeocoding:
+
+    async def test_concurrent_lookups_share_one_request(self, nominatim, httpx_mock):
+        httpx_mock.add_response(json=SEARCH_RESULT)
+
+        results = await asyncio.gather(*(geocoding.validate_city("Oslo") for _ in range(50)))
+
+        assert len(httpx_mock.get_requests()) == 1
+        assert all(r == {"city": "Oslo", "country": "NO", "lat": 59.91, "lon": 10.75} for r in results)
+        assert nominatim.cache_stats()["inflight_keys"] == 0
+        await nominatim.aclose()
+
+    async def test_requests_are_paced_to_the_policy_rate(self, nominatim, httpx_mock, monkeypatch):
+        monkeypatch.setattr(nominatim, "_limiter", UpstreamLimiter(rate=20, burst=1, max_in_flight=1))
+        httpx_mock.add_response(json=SEARCH_RESULT)
+        httpx_mock.add_response(json=SEARCH_RESULT)
+        httpx_mock.add_response(json=SEARCH_RESULT)
+        loop = asyncio.get_running_loop()
+
+        start = loop.time()
+        await asyncio.gather(*(geocoding.validate_city(name) for name in ("a", "b", "c")))
+
+        assert loop.time() - start >= 0.09
+        await nominatim.aclose()
+
+    async def test_queue_timeout_gives_up_without_caching(self, nominatim, httpx_mock, monkeypatch):
+        monkeypatch.setattr(nominatim, "_limiter", UpstreamLimiter(rate=10, burst=1, max_in_flight=1))
+        monkeypatch.setattr(settings, "NOMINATIM_MAX_QUEUE_SECONDS", 0.02)
+        httpx_mock.add_response(json=SEARCH_RESULT)
+        httpx_mock.add_response(json=SEARCH_RESULT)
+
+        names = ("Oslo", "Bergen")
+        results = await asyncio.gather(*(geocoding.validate_city(n) for n in names), return_exceptions=True)
+
+        # Either lookup may reach the limiter first (both check the database before queueing)
+        queued = next(n for n, r in zip(names, results) if isinstance(r, GeocodingUnavailableError))
+        assert sum(isinstance(r, dict) for r in results) == 1
+        assert nominatim._cache.get_entry(f"city:{queued.lower()}", count=False) is None
+        await asyncio.sleep(0.1)
+        assert await geocoding.validate_city(queued) is not None
+        await nominatim.aclose()
+
+    async def test_no_match_is_cached_with_the_negative_ttl(self, nominatim, httpx_mock):
+        httpx_mock.add_response(json=[])
+
+        assert await geocoding.validate_city("Atlantys") is None
+        assert await geocoding.validate_city("Atlantys") is None
+
+        entry = nominatim._cache.get_entry("city:atlantys", count=False)
+        assert entry.expires_at - entry.stored_at == settings.GEOCODE_NEGATIVE_TTL_SECONDS
+        assert nominatim.cache_stats()["negative_hits"] == 1
+        await nominatim.aclose()
+
+    async def test_failures_are_shared_but_not_cached(self, nominatim, httpx_mock):
+        httpx_mock.add_response(status_code=503)
+        httpx_mock.add_response(json=SEARCH_RESULT)
+
+        failed = await asyncio.gather(*(geocoding.validate_city("Oslo") for _ in range(5)), return_exceptions=True)
+
+        assert all(isinstance(e, GeocodingUnavailableError) for e in failed)
+        assert len(httpx_mock.get_requests()) == 1
+        assert (await geocoding.validate_city("Oslo"))["city"] == "Oslo"
+        assert nominatim.cache_stats()["errors"] == 1
+        await nominatim.aclose()
+
+    async def test_reverse_geocode_failure_only_drops_the_label(self, nominatim, httpx_mock):
+        httpx_mock.add_exception(httpx.ConnectError("down"))
+
+        assert await geocoding.reverse_geocode(59.91, 10.75) is None
+        assert geocoding.cached_reverse(59.91, 10.75) is None
+        await nominatim.aclose()
+
+    async def test_geocodes_are_written_through_and_shared(self, nominatim, httpx_mock):
+        httpx_mock.add_response(json=SEARCH_RESULT)
+        await geocoding.validate_city("  OSLO ")
+        await nominatim.aclose()
+
+        # A fresh process (empty memory cache) answers from the database, not the network
+        other = NominatimClient(store=GeocodeStore(TestingSessionLocal))
+        city = await other.lookup("city", "oslo", "/search", {}, lambda data: None)
+        near = await other.lookup("coords", "59.91,10.75", "/reverse", {}, lambda data: None)
+
+        assert city == {"city": "Oslo", "country": "NO", "lat": 59.91, "lon": 10.75}
+        assert near == {"city": "Oslo", "country": "NO"}
+        assert len(httpx_mock.get_requests()) == 1
+        assert other.cache_stats()["db"]["hits"] == 2
+
+    async def test_rewrites_upsert_one_row_per_key(self, nominatim):
+        store = GeocodeStore(TestingSessionLocal)
+        oslo = {"city": "Oslo", "country": "NO", "lat": 59.91, "lon": 10.75}
+
+        for name in ("oslo", "oslo", "christiania"):
+            await store.put("city", name, oslo)
+        await store.put("coords", "59.91,10.75", {"city": "Sentrum", "country": "NO"}, lat=59.91, lon=10.75)
+
+        async with TestingSessionLocal() as session:
+            rows = (await session.execute(select(Location.normalized_name, Location.coord_key, Location.city_name))).all()
+        assert sorted(rows, key=str) == [
+            ("christiania", None, "Oslo"), ("oslo", None, "Oslo"), (None, "59.91,10.75", "Sentrum"),
+        ]
+        assert store.errors == 0
+
+    async def test_expired_rows_go_back_to_nominatim(self, nominatim, httpx_mock, monkeypatch):
+        httpx_mock.add_response(json=SEARCH_RESULT)
+        httpx_mock.add_response(json=SEARCH_RESULT)
+        await geocoding.validate_city("Oslo")
+        monkeypatch.setattr(settings, "GEOCODE_CACHE_TTL_SECONDS", 0)
+
+        other = NominatimClient(store=GeocodeStore(TestingSessionLocal))
+        monkeypatch.setattr(geocoding, "nominatim", other)
+
+        assert (await geocoding.validate_city("Oslo"))["city"] == "Oslo"
+        assert len(httpx_mock.get_requests()) == 2
+        await nominatim.aclose()
+        await other.aclose()
+
+    async def test_geocode_refresh_leaves_watchlist_locations_alone(self, nominatim, httpx_mock, monkeypatch):
+        moved = [{"lat": "60.0", "lon": "11.0", "address": {"city": "Oslo", "country_code": "no"}}]
+        httpx_mock.add_response(json=SEARCH_RESULT)
+        httpx_mock.add_response(json=moved)
+        await geocoding.validate_city("Oslo")
+        async with TestingSessionLocal() as session:
+            watched = await LocationRepository(session).get_or_create("Oslo", "NO", 59.91, 10.75)
+            await session.commit()
+
+        monkeypatch.setattr(settings, "GEOCODE_CACHE_TTL_SECONDS", 0)
+        other = NominatimClient(store=GeocodeStore(TestingSessionLocal))
+        monkeypatch.setattr(geocoding, "nominatim", other)
+        await geocoding.validate_city("Oslo")
+
+        async with TestingSessionLocal() as session:
+            location = await session.get(Location, watched.id)
+            assert location.geocoded_at is None
+            assert (location.latitude, location.longitude) == (59.91, 10.75)
+            assert (await LocationRepository(session).get_by_city("Oslo")).id == watched.id
+        await nominatim.aclose()
+        await other.aclose()
@@ -0,0 +1,31 @@
+import cbor2
+import msgpack
+
+from app.utils.media import CBOR, JSON, MSGPACK, encode, negotiate_media_type
+
+PAYLOAD = {"city_name": "London", "temp": 15.5, "rh": 72, "alerts": [], "aqi": None}
+
+
+class TestMedia:
+    def test_binary_encodings_round_trip_the_json_schema(self):
+        assert msgpack.unpackb(encode(PAYLOAD, MSGPACK)) == PAYLOAD
+        assert cbor2.loads(encode(PAYLOAD, CBOR)) == PAYLOAD
+
+    def test_negotiation_prefers_highest_q_then_client_order(self):
+        assert negotiate_media_type("application/msgpack") == MSGPACK
+        assert negotiate_media_type("application/x-msgpack") == MSGPACK
+        assert negotiate_media_type("application/cbor, application/msgpack") == CBOR
+        assert negotiate_media_type("application/msgpack;q=0.5, */*") == JSON
+        assert negotiate_media_type("application/json;q=0.1, application/cbor") == CBOR
+
+    def test_unknown_or_missing_accept_means_json(self):
+        assert negotiate_media_type(None) == JSON
+        assert negotiate_media_type("text/html,application/xhtml+xml") == JSON
+        assert negotiate_media_type("application/vnd.weather.columnar+json") == JSON
+
+    def test_endpoint_types_are_negotiated_with_q_values(self):
+        columnar = "application/vnd.weather.columnar+json"
+
+        assert negotiate_media_type(columnar, extra=(columnar,)) == columnar
+        assert negotiate_media_type(f"{columnar};q=0, application/json", extra=(columnar,)) == JSON
+        assert negotiate_media_type(f"{columnar};q=0.2, application/cbor", extra=(columnar,)) == CBOR
@@ -0,0 +1,64 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.location import Location
+from app.models.watchlist import WatchlistItem
+from app.services.prefetch_scheduler import PrefetchScheduler
+from app.services.weather_client import ResolvedLocation, UpstreamResult
+from app.tests.conftest import engine
+
+
+async def _watch(db_session, city: str, watchers: int) -> None:
+    location = Location(city_name=city, country_code="GB", latitude=51.5, longitude=-0.1)
+    db_session.add(location)
+    await db_session.flush()
+    for i in range(watchers):
+        db_session.add(WatchlistItem(user_id=f"user-{i}", location_id=location.id))
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+class TestPrefetchScheduler:
+    async def test_recent_access_outranks_watcher_count(self):
+        scheduler = PrefetchScheduler()
+        for _ in range(6):
+            scheduler.note_access("Paris")
+
+        assert scheduler.rank([("London", 2), ("Paris", 1), ("Oslo", 1)]) == ["Paris", "London", "Oslo"]
+
+    @patch("app.services.prefetch_scheduler.weather_client")
+    async def test_run_once_refreshes_most_watched(self, mock_client, db_session):
+        await _watch(db_session, "London", 2)
+        await _watch(db_session, "Leeds", 1)
+        live = UpstreamResult({"data": []}, "live")
+        mock_client.resolve_location = AsyncMock(return_value=ResolvedLocation({"lat": "51.5", "lon": "-0.1"}))
+        mock_client.get_current_weather = AsyncMock(return_value=live)
+        mock_client.get_forecast_daily = AsyncMock(return_value=live)
+        mock_client.get_forecast_hourly = AsyncMock(return_value=live)
+        mock_client.get_alerts = AsyncMock(return_value=live)
+        mock_client.breaker.state = "closed"
+
+        scheduler = PrefetchScheduler(async_sessionmaker(engine, class_=AsyncSession))
+        refreshed, failures = await scheduler.run_once()
+
+        assert (refreshed, failures) == (2, 0)
+        cities = [call.kwargs["city"] for call in mock_client.get_current_weather.await_args_list]
+        assert cities == ["London", "Leeds"]
+        assert mock_client.get_current_weather.await_args.kwargs["max_age"] < 300
+
+    @patch("app.services.prefetch_scheduler.weather_client")
+    async def test_refresh_without_geocoding_takes_alert_coordinates_from_forecast(self, mock_client):
+        live = UpstreamResult({"data": []}, "live")
+        daily = UpstreamResult({"data": [], "lat": 51.51, "lon": -0.13}, "live")
+        # GeocodingUnavailableError during resolve: the city is passed upstream by name
+        mock_client.resolve_location = AsyncMock(return_value=ResolvedLocation({"city": "London"}))
+        mock_client.get_current_weather = AsyncMock(return_value=live)
+        mock_client.get_forecast_daily = AsyncMock(return_value=daily)
+        mock_client.get_forecast_hourly = AsyncMock(return_value=live)
+        mock_client.get_alerts = AsyncMock(return_value=live)
+
+        assert await PrefetchScheduler()._refresh("London") is True
+        assert mock_client.get_alerts.await_args.kwargs["lat"] == 51.51
+        assert mock_client.get_alerts.await_args.kwargs["lon"] == -0.13
@@ -0,0 +1,31 @@
+import pytest
+
+from app.core.exceptions import ValidationError
+from app.utils.projection import parse_fields, selection_key
+
+SCHEMA = {"city_name": None, "daily": ("date", "temp_high"), "hourly": ("timestamp", "temp", "icon")}
+
+
+class TestProjection:
+    def test_nested_selectors_keep_schema_order(self):
+        selection = parse_fields("hourly.icon, hourly.temp,city_name", SCHEMA)
+
+        assert selection == {"city_name": None, "hourly": ("temp", "icon")}
+
+    def test_bare_parent_selects_everything_under_it(self):
+        assert parse_fields("hourly.temp,hourly", SCHEMA) == {"hourly": None}
+
+    def test_default_parent_resolves_bare_children(self):
+        assert parse_fields("temp,data.icon", {"data": ("temp", "icon", "aqi")}, default_parent="data") == {
+            "data": ("temp", "icon")
+        }
+
+    def test_equivalent_selections_share_a_key(self):
+        assert selection_key(parse_fields("hourly.icon,city_name,hourly.temp", SCHEMA)) == selection_key(
+            parse_fields("city_name,hourly.temp,hourly.icon", SCHEMA)
+        )
+
+    @pytest.mark.parametrize("spec", ["hourly.aqi", "nope", "city_name.x", " , "])
+    def test_invalid_selectors_are_rejected(self, spec):
+        with pytest.raises(ValidationError):
+            parse_fields(spec, SCHEMA)
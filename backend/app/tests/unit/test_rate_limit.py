@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils.rate_limit import TokenBucket, UpstreamLimiter
+
+
+@pytest.mark.asyncio
+class TestTokenBucket:
+
+    async def test_burst_starts_immediately_then_paces(self):
+        bucket = TokenBucket(rate=20, burst=3)
+        start = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        assert time.monotonic() - start < 0.03
+
+        await bucket.acquire()
+        assert time.monotonic() - start >= 0.04
+
+    async def test_acquire_gives_up_when_wait_exceeds_timeout(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        assert await bucket.acquire()
+        assert await bucket.acquire(timeout=0.1) is False
+        # The refused caller did not consume a token
+        assert await bucket.acquire(timeout=1.1)
+
+
+@pytest.mark.asyncio
+class TestUpstreamLimiter:
+
+    async def test_requests_overlap_up_to_in_flight_cap(self):
+        limiter = UpstreamLimiter(rate=1000, burst=10, max_in_flight=3)
+        active = 0
+        peak = 0
+
+        async def call():
+            nonlocal active, peak
+            async with limiter.slot():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.05)
+                active -= 1
+
+        start = time.monotonic()
+        await asyncio.gather(*(call() for _ in range(6)))
+
+        assert peak == 3
+        assert time.monotonic() - start < 0.2
+
+    async def test_queue_wait_is_bounded_by_timeout(self):
+        limiter = UpstreamLimiter(rate=1, burst=1, max_in_flight=1)
+
+        async with limiter.slot(timeout=0.1):
+            with pytest.raises(TimeoutError):
+                async with limiter.slot(timeout=0.05):
+                    pass
+
+        # Free slot but no token for ~1s: the bucket wait counts against the same timeout
+        with pytest.raises(TimeoutError):
+            async with limiter.slot(timeout=0.1):
+                pass
+        assert limiter.waiting == 0
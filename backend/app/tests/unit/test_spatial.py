@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from app.services.mock_weather import _resolve_city
+from app.utils.spatial import SpatialIndex, haversine_km
+
+# Suva, Fiji (178.4 E) and Apia, Samoa (171.8 W) sit either side of the antimeridian
+POINTS = [(51.51, -0.13), (-18.14, 178.44), (-13.83, -171.76), (40.71, -74.01), (-33.87, 151.21)]
+
+
+class TestSpatialIndex:
+
+    def test_haversine_distance(self):
+        assert haversine_km(51.51, -0.13, 48.86, 2.35) == pytest.approx(343, abs=2)
+        assert haversine_km(0, 179.5, 0, -179.5) == pytest.approx(111.2, abs=0.5)
+
+    def test_nearest_across_the_antimeridian(self):
+        index = SpatialIndex(POINTS)
+
+        point, km = index.nearest(-14.0, -179.9)
+
+        assert point == 1
+        assert km == pytest.approx(haversine_km(-14.0, -179.9, *POINTS[1]))
+
+    def test_nearest_respects_max_distance(self):
+        index = SpatialIndex(POINTS)
+
+        assert index.nearest(51.5, -0.1, max_km=10)[0] == 0
+        assert index.nearest(0.0, 0.0, max_km=1000) is None
+        assert SpatialIndex([]).nearest(0.0, 0.0) is None
+
+    def test_queries_match_a_linear_scan(self):
+        rng = random.Random(7)
+        points = [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(2000)]
+        index = SpatialIndex(points)
+
+        for _ in range(50):
+            lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+            distances = [haversine_km(lat, lon, *p) for p in points]
+            _, km = index.nearest(lat, lon)
+            assert km == pytest.approx(min(distances))
+            within = index.within(lat, lon, 800)
+            assert sorted(p for p, _ in within) == [i for i, d in enumerate(distances) if d <= 800]
+            assert [d for _, d in within] == sorted(d for _, d in within)
+
+
+class TestMockNearestCity:
+
+    def test_point_near_known_city_takes_its_name(self):
+        assert _resolve_city(None, 51.6, -0.2)[0] == "London"
+
+    def test_remote_point_is_local_area(self):
+        assert _resolve_city(None, -60.0, -140.0)[3] == "XX"
@@ -0,0 +1,238 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import GeocodingUnavailableError
+from app.services.upstream_archive import UpstreamArchive
+from app.services.weather_client import CACHE_TTL_SECONDS, ResolvedLocation, WeatherBitClient
+from app.utils.circuit_breaker import CircuitBreaker, CircuitState
+
+
+@pytest.fixture(autouse=True)
+def rapidapi_key(monkeypatch):
+    monkeypatch.setattr(settings, "RAPIDAPI_KEY", "test-key")
+
+
+@pytest.mark.asyncio
+class TestWeatherBitClient:
+
+    async def test_http_client_is_shared_across_fetches(self, httpx_mock):
+        httpx_mock.add_response(json={"data": [{"temp": 10}]})
+        httpx_mock.add_response(json={"data": [{"temp": 11}]})
+        client = WeatherBitClient()
+        await client.start()
+        pooled = client.http
+
+        await client._rate_limited_fetch("https://upstream.test/current", {"lat": "1"})
+        await client._rate_limited_fetch("https://upstream.test/current", {"lat": "2"})
+
+        assert client.http is pooled
+        await client.aclose()
+
+    async def test_aclose_releases_pool(self):
+        client = WeatherBitClient()
+        pooled = client.http
+
+        await client.aclose()
+
+        assert pooled.is_closed
+        assert client.http is not pooled
+        await client.aclose()
+
+    async def test_stale_entry_is_served_while_revalidating(self, httpx_mock):
+        httpx_mock.add_response(json={"alerts": [{"title": "old"}]})
+        httpx_mock.add_response(json={"alerts": [{"title": "new"}]})
+        client = WeatherBitClient()
+        await client.get_alerts(lat=1.0, lon=2.0)
+        _age_cache(client, CACHE_TTL_SECONDS + 1)
+
+        data, source, _ = await client.get_alerts(lat=1.0, lon=2.0)
+        assert (data["alerts"][0]["title"], source) == ("old", "stale")
+
+        await asyncio.gather(*client._background)
+        data, source, _ = await client.get_alerts(lat=1.0, lon=2.0)
+        assert (data["alerts"][0]["title"], source) == ("new", "live")
+        await client.aclose()
+
+    async def test_stale_entry_is_served_when_upstream_fails(self, httpx_mock):
+        httpx_mock.add_response(json={"alerts": [{"title": "cached"}]})
+        httpx_mock.add_response(status_code=503)
+        client = WeatherBitClient()
+        await client.get_alerts(lat=1.0, lon=2.0)
+        _age_cache(client, CACHE_TTL_SECONDS + settings.CACHE_STALE_WHILE_REVALIDATE_SECONDS + 1)
+
+        data, source, _ = await client.get_alerts(lat=1.0, lon=2.0)
+
+        assert (data["alerts"][0]["title"], source) == ("cached", "stale")
+        await client.aclose()
+
+    async def test_open_circuit_skips_upstream_and_falls_back_to_mock(self, httpx_mock):
+        httpx_mock.add_response(status_code=503)
+        client = WeatherBitClient()
+        client.breaker = CircuitBreaker("weatherbit", failure_threshold=1, recovery_timeout=60)
+
+        first = (await client.get_alerts(lat=1.0, lon=2.0)).source
+        second = (await client.get_alerts(lat=3.0, lon=4.0)).source  # would fail the test if sent upstream
+
+        assert (first, second) == ("mock", "mock")
+        assert client.breaker.state is CircuitState.OPEN
+        await client.aclose()
+
+    async def test_client_error_does_not_open_the_circuit(self, httpx_mock):
+        httpx_mock.add_response(status_code=400)
+        client = WeatherBitClient()
+        client.breaker = CircuitBreaker("weatherbit", failure_threshold=1, recovery_timeout=60)
+
+        assert (await client.get_alerts(lat=1.0, lon=2.0)).source == "mock"
+        assert client.breaker.state is CircuitState.CLOSED
+        await client.aclose()
+
+    async def test_dropped_keep_alive_connection_falls_back_like_other_failures(self, httpx_mock):
+        httpx_mock.add_exception(httpx.RemoteProtocolError("Server disconnected without sending a response."))
+        httpx_mock.add_exception(httpx.ReadError("Connection reset by peer"))
+        client = WeatherBitClient()
+        client.breaker = CircuitBreaker("weatherbit", failure_threshold=1, recovery_timeout=60)
+
+        result = await client.get_alerts(lat=1.0, lon=2.0)
+
+        assert result.source == "mock"
+        assert len(httpx_mock.get_requests()) == 2  # retried once on a fresh connection
+        assert client.breaker.state is CircuitState.OPEN
+        await client.aclose()
+
+    async def test_resolved_location_is_reverse_geocoded_once(self, httpx_mock, monkeypatch):
+        lookups = []
+
+        async def fake_reverse_geocode(lat, lon):
+            lookups.append((lat, lon))
+            return {"city": "Testville", "country": "TV"}
+
+        monkeypatch.setattr("app.services.geocoding.reverse_geocode", fake_reverse_geocode)
+        httpx_mock.add_response(json={"city_name": "Raw", "data": []})
+        httpx_mock.add_response(json={"city_name": "Raw", "data": []})
+        client = WeatherBitClient()
+
+        location = await client.resolve_location(lat=1.0, lon=2.0)
+        daily, hourly = await asyncio.gather(
+            client.get_forecast_daily(lat=1.0, lon=2.0, location=location),
+            client.get_forecast_hourly(lat=1.0, lon=2.0, location=location),
+        )
+
+        assert lookups == [(1.0, 2.0)]
+        assert (daily.data["city_name"], hourly.data["city_name"]) == ("Testville", "Testville")
+        await client.aclose()
+
+    async def test_geocoding_outage_falls_back_to_city_name(self, monkeypatch):
+        async def failing_validate_city(city):
+            raise GeocodingUnavailableError()
+
+        monkeypatch.setattr("app.services.geocoding.validate_city", failing_validate_city)
+
+        location = await WeatherBitClient().resolve_location(city="Oslo")
+
+        assert location.params == {"city": "Oslo"}
+
+    async def test_daily_from_hourly_mode_uses_one_upstream_call(self, httpx_mock, monkeypatch):
+        monkeypatch.setattr(settings, "FORECAST_DAILY_FROM_HOURLY", True)
+        rows = [
+            {"timestamp_local": f"2025-01-{15 + i // 24}T{i % 24:02d}:00:00", "temp": float(i % 24), "weather": {"code": 800}}
+            for i in range(120)
+        ]
+        httpx_mock.add_response(json={"city_name": "Raw", "data": rows})
+        client = WeatherBitClient()
+        location = ResolvedLocation({"lat": "1", "lon": "2"})
+
+        daily, hourly = await asyncio.gather(
+            client.get_forecast_daily(lat=1.0, lon=2.0, days=5, location=location),
+            client.get_forecast_hourly(lat=1.0, lon=2.0, hours=48, location=location),
+        )
+
+        (request,) = httpx_mock.get_requests()
+        assert request.url.path == "/forecast/hourly" and request.url.params["hours"] == "120"
+        assert [d["high_temp"] for d in daily.data["data"]] == [23.0] * 5
+        assert len(hourly.data["data"]) == 48
+        await client.aclose()
+
+    async def test_hourly_horizons_are_sliced_from_one_cached_fetch(self, httpx_mock):
+        rows = [{"timestamp_local": f"hour-{i}", "temp": float(i)} for i in range(120)]
+        httpx_mock.add_response(json={"city_name": "Raw", "data": rows})
+        client = WeatherBitClient()
+        location = ResolvedLocation({"lat": "1", "lon": "2"})
+
+        widget = await client.get_forecast_hourly(hours=24, location=location)
+        chart = await client.get_forecast_hourly(hours=72, location=location)
+
+        (request,) = httpx_mock.get_requests()
+        assert request.url.params["hours"] == str(settings.FORECAST_HOURLY_HORIZON_HOURS)
+        assert (len(widget.data["data"]), len(chart.data["data"])) == (24, 72)
+        await client.aclose()
+
+    async def test_labels_and_slices_leave_the_cached_fetch_untouched(self, httpx_mock):
+        rows = [{"timestamp_local": f"hour-{i}", "temp": float(i)} for i in range(120)]
+        httpx_mock.add_response(json={"city_name": "Raw", "data": rows})
+        client = WeatherBitClient()
+        params = {"lat": "1", "lon": "2"}
+
+        first = await client.get_forecast_hourly(hours=24, location=ResolvedLocation(params, {"city": "Alias"}))
+        second = await client.get_forecast_hourly(hours=120, location=ResolvedLocation(params))
+
+        assert (first.data["city_name"], len(first.data["data"])) == ("Alias", 24)
+        assert (second.data["city_name"], len(second.data["data"])) == ("Raw", 120)
+        await client.aclose()
+
+    async def test_missing_api_key_never_contacts_upstream(self, monkeypatch):
+        monkeypatch.setattr(settings, "RAPIDAPI_KEY", "")
+        client = WeatherBitClient()
+
+        source = (await client.get_alerts(lat=1.0, lon=2.0)).source
+
+        assert source == "mock"
+
+    async def test_mock_mode_skips_network(self, monkeypatch):
+        monkeypatch.setattr(settings, "UPSTREAM_MODE", "mock")
+        client = WeatherBitClient()
+
+        data, source, _ = await client.get_current_weather(city="London")
+
+        assert source == "mock"
+        assert data["data"][0]["country_code"] == "GB"
+
+    async def test_recorded_responses_replay_without_network(self, httpx_mock, monkeypatch, tmp_path):
+        monkeypatch.setattr("app.services.weather_client.upstream_archive", UpstreamArchive(str(tmp_path)))
+        httpx_mock.add_response(json={"alerts": [{"title": "recorded"}]})
+
+        monkeypatch.setattr(settings, "UPSTREAM_MODE", "record")
+        recorder = WeatherBitClient()
+        await recorder.get_alerts(lat=1.0, lon=2.0)
+        await recorder.aclose()
+
+        monkeypatch.setattr(settings, "UPSTREAM_MODE", "replay")
+        monkeypatch.setattr(settings, "RAPIDAPI_KEY", "")
+        data, source, _ = await WeatherBitClient().get_alerts(lat=1.0, lon=2.0)
+
+        assert (data["alerts"][0]["title"], source) == ("recorded", "live")
+
+    async def test_replay_misses_do_not_open_the_circuit(self, httpx_mock, monkeypatch, tmp_path):
+        monkeypatch.setattr("app.services.weather_client.upstream_archive", UpstreamArchive(str(tmp_path)))
+        httpx_mock.add_response(json={"alerts": [{"title": "recorded"}]})
+        monkeypatch.setattr(settings, "UPSTREAM_MODE", "record")
+        recorder = WeatherBitClient()
+        await recorder.get_alerts(lat=1.0, lon=2.0)
+        await recorder.aclose()
+
+        monkeypatch.setattr(settings, "UPSTREAM_MODE", "replay")
+        client = WeatherBitClient()
+        client.breaker = CircuitBreaker("weatherbit", failure_threshold=1, recovery_timeout=60)
+        unrecorded = [(await client.get_alerts(lat=float(i), lon=9.0)).source for i in range(3)]
+        _, source, _ = await client.get_alerts(lat=1.0, lon=2.0)
+
+        assert unrecorded == ["mock"] * 3
+        assert source == "live"
+        assert client.breaker.state is CircuitState.CLOSED
+
+
+def _age_cache(client: WeatherBitClient, seconds: float) -> None:
+    for key in list(client._cache._data):
+        client._cache._data[key].stored_at -= seconds
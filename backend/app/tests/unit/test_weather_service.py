@@ -1,10 +1,18 @@
 
-from unittest.mock import AsyncMock, patch 
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, patch
 
+import msgpack
 import pytest
 
+from app.core.config import settings
 from app.schemas.weather import CurrentWeatherResponse, ForecastResponse
+from app.services import weather_service
+from app.services.weather_client import ResolvedLocation, UpstreamResult
 from app.services.weather_service import WeatherService
+from app.utils import media
 from app.core.exceptions import NotFoundError
 
 
@@ -61,13 +69,22 @@ MOCK_HOURLY_RESPONSE = {
 MOCK_ALERTS_RESPONSE = {"alerts": []}
 
 
+@pytest.fixture(autouse=True)
+def clear_result_memo():
+    weather_service._results.clear()
+    weather_service._versions.clear()
+    yield
+    weather_service._results.clear()
+    weather_service._versions.clear()
+
+
 @pytest.mark.asyncio
 class TestWeatherService:
 
     @patch("app.services.weather_service.weather_client")
     async def test_get_current_weather(self, mock_client):
         mock_client.get_current_weather = AsyncMock(
-            return_value=(MOCK_CURRENT_RESPONSE, True)
+            return_value=UpstreamResult(MOCK_CURRENT_RESPONSE, "mock")
         )
 
         service = WeatherService()
@@ -85,7 +102,7 @@ class TestWeatherService:
     @patch("app.services.weather_service.weather_client")
     async def test_get_current_weather_empty_data(self, mock_client):
         mock_client.get_current_weather = AsyncMock(
-            return_value=({"data": []}, True)
+            return_value=UpstreamResult({"data": []}, "mock")
         )
 
         service = WeatherService()
@@ -95,14 +112,17 @@ class TestWeatherService:
 
     @patch("app.services.weather_service.weather_client")
     async def test_get_forecast(self, mock_client):
+        mock_client.resolve_location = AsyncMock(
+            return_value=ResolvedLocation({"lat": "51.5", "lon": "-0.12"})
+        )
         mock_client.get_forecast_daily = AsyncMock(
-            return_value=(MOCK_DAILY_RESPONSE, True)
+            return_value=UpstreamResult(MOCK_DAILY_RESPONSE, "mock")
         )
         mock_client.get_forecast_hourly = AsyncMock(
-            return_value=(MOCK_HOURLY_RESPONSE, True)
+            return_value=UpstreamResult(MOCK_HOURLY_RESPONSE, "mock")
         )
         mock_client.get_alerts = AsyncMock(
-            return_value=(MOCK_ALERTS_RESPONSE, True)
+            return_value=UpstreamResult(MOCK_ALERTS_RESPONSE, "mock")
         )
 
         service = WeatherService()
@@ -114,11 +134,13 @@ class TestWeatherService:
         assert len(result.hourly) == 1
         assert result.daily[0].date == "2025-01-15"
         assert result.hourly[0].temp == 10.5
+        mock_client.resolve_location.assert_awaited_once()
+        mock_client.get_alerts.assert_awaited_once_with(lat=51.5, lon=-0.12)
 
     @patch("app.services.weather_service.weather_client")
     async def test_get_current_by_coordinates(self, mock_client):
         mock_client.get_current_weather = AsyncMock(
-            return_value=(MOCK_CURRENT_RESPONSE, True)
+            return_value=UpstreamResult(MOCK_CURRENT_RESPONSE, "mock")
         )
 
         service = WeatherService()
@@ -129,3 +151,114 @@ class TestWeatherService:
         mock_client.get_current_weather.assert_called_once_with(
             city=None, lat=51.5074, lon=-0.1278
         )
+
+    @patch("app.services.weather_service.weather_client")
+    async def test_concurrent_identical_requests_share_one_build(self, mock_client):
+        async def slow_current(**kwargs):
+            await asyncio.sleep(0.01)
+            return UpstreamResult(MOCK_CURRENT_RESPONSE, "mock")
+
+        mock_client.get_current_weather = AsyncMock(side_effect=slow_current)
+
+        service = WeatherService()
+        results = await asyncio.gather(
+            *(service.get_current(city=name) for name in ["London", "london ", " LONDON"] * 10)
+        )
+
+        assert mock_client.get_current_weather.await_count == 1
+        assert all(result is results[0] for result in results)
+
+    @patch("app.services.weather_service.weather_client")
+    async def test_fresh_result_is_cached_as_encoded_json_until_expiry(self, mock_client):
+        mock_client.get_current_weather = AsyncMock(
+            return_value=UpstreamResult(MOCK_CURRENT_RESPONSE, "live", time.time())
+        )
+
+        service = WeatherService()
+        first = await service.get_current_result(city="London")
+        second = await service.get_current_result(city="London")
+
+        assert second is first
+        assert json.loads(first.content) == first.body.model_dump()
+        assert first.max_age > settings.WEATHER_RESULT_MEMO_SECONDS
+        assert mock_client.get_current_weather.await_count == 1
+
+    @patch("app.services.weather_service.weather_client")
+    async def test_etag_follows_the_body_not_the_fetch(self, mock_client):
+        fetched = UpstreamResult(MOCK_CURRENT_RESPONSE, "live", time.time())
+        mock_client.get_current_weather = AsyncMock(return_value=fetched)
+
+        service = WeatherService()
+        full = await service.get_current_result(city="London")
+        projected = await service.get_current_result(city="London", fields={"data": {"temp": None}})
+        weather_service._results.clear()
+        refetched = await service.get_current_result(city="London")
+
+        assert projected.etag != full.etag
+        assert refetched.etag == full.etag
+
+    @patch("app.services.weather_service.weather_client")
+    async def test_mock_fallback_expires_immediately(self, mock_client, monkeypatch):
+        monkeypatch.setattr(settings, "UPSTREAM_MODE", "live")
+        mock_client.get_current_weather = AsyncMock(
+            return_value=UpstreamResult(MOCK_CURRENT_RESPONSE, "mock", time.time())
+        )
+
+        result = await WeatherService().get_current_result(city="London")
+
+        assert result.max_age <= 0
+        key = "current:" + weather_service._location_key("London", None, None)
+        entry = weather_service._results.get_entry(key, count=False)
+        assert entry.expires_at - entry.stored_at == settings.WEATHER_RESULT_MEMO_SECONDS
+
+    @patch("app.services.weather_service.weather_client")
+    async def test_binary_encodings_are_built_once_per_result(self, mock_client):
+        mock_client.get_current_weather = AsyncMock(
+            return_value=UpstreamResult(MOCK_CURRENT_RESPONSE, "live", time.time())
+        )
+
+        result = await WeatherService().get_current_result(city="London")
+        packed = result.variants_for(media.MSGPACK)
+
+        assert result.variants_for(media.MSGPACK) is packed
+        assert msgpack.unpackb(packed["identity"]) == json.loads(result.content)
+        assert result.variants_for(media.JSON) is result.variants
+
+    @patch("app.services.weather_service.weather_client")
+    async def test_delta_lists_changed_rows_since_a_held_version(self, mock_client, monkeypatch):
+        monkeypatch.setattr(settings, "WEATHER_RESULT_MEMO_SECONDS", 0)
+        hour = MOCK_HOURLY_RESPONSE["data"][0]
+        shifted = {"data": [
+            {**hour, "timestamp_local": "2025-01-15T11:00:00", "temp": 12.0},
+            {**hour, "timestamp_local": "2025-01-15T12:00:00"},
+        ]}
+        previous = {"data": [hour, {**hour, "timestamp_local": "2025-01-15T11:00:00"}]}
+        mock_client.resolve_location = AsyncMock(return_value=ResolvedLocation({"lat": "51.5", "lon": "-0.12"}))
+        mock_client.get_forecast_daily = AsyncMock(return_value=UpstreamResult(MOCK_DAILY_RESPONSE, "live", 100.0))
+        mock_client.get_forecast_hourly = AsyncMock(side_effect=[
+            UpstreamResult(previous, "live", 100.0), UpstreamResult(shifted, "live", 400.0),
+        ])
+        mock_client.get_alerts = AsyncMock(return_value=UpstreamResult(MOCK_ALERTS_RESPONSE, "live", 100.0))
+
+        service = WeatherService()
+        held = await service.get_forecast_result(city="London")
+        delta, is_delta = await service.get_forecast_delta(held.etag, city="London")
+
+        assert is_delta
+        assert (delta.body["from"], delta.body["to"]) == (held.etag, delta.body["to"])
+        assert [r["timestamp"] for r in delta.body["hourly"]["added"]] == ["2025-01-15T12:00:00"]
+        assert [r["temp"] for r in delta.body["hourly"]["changed"]] == [12.0]
+        assert delta.body["hourly"]["removed"] == ["2025-01-15T10:00:00"]
+        assert "daily" not in delta.body
+
+    @patch("app.services.weather_service.weather_client")
+    async def test_unknown_delta_base_returns_full_forecast(self, mock_client):
+        mock_client.resolve_location = AsyncMock(return_value=ResolvedLocation({"lat": "51.5", "lon": "-0.12"}))
+        mock_client.get_forecast_daily = AsyncMock(return_value=UpstreamResult(MOCK_DAILY_RESPONSE, "mock"))
+        mock_client.get_forecast_hourly = AsyncMock(return_value=UpstreamResult(MOCK_HOURLY_RESPONSE, "mock"))
+        mock_client.get_alerts = AsyncMock(return_value=UpstreamResult(MOCK_ALERTS_RESPONSE, "mock"))
+
+        result, is_delta = await WeatherService().get_forecast_delta('"evicted"', city="London")
+
+        assert not is_delta
+        assert isinstance(result.body, ForecastResponse)
@@ -0,0 +1,375 @@
+"""Caching primitives: pluggable TTL cache backends (in-process LRU or shared SQLite) and
+self-cleaning per-key locks."""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from app.core.config import settings
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    value: Any
+    stored_at: float  # wall-clock seconds
+    expires_at: float
+    size: int
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate payload size in bytes (JSON length) for byte-budget accounting."""
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class CacheBackend(Protocol):
+    """Interface shared by cache backends. Values must be JSON-serializable for shared backends.
+
+    Code on the event loop uses the async `aget_entry` / `aset`: backends doing blocking I/O run
+    them in a worker thread, the in-process cache answers inline.
+    """
+
+    def get_entry(self, key: str, count: bool = True) -> CacheEntry | None: ...
+
+    def get(self, key: str) -> Any | None: ...
+
+    def set(
+        self, key: str, value: Any, ttl: float | None = None, size: int | None = None,
+        stored_at: float | None = None,
+    ) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def stats(self) -> dict: ...
+
+    async def aget_entry(self, key: str, count: bool = True) -> CacheEntry | None: ...
+
+    async def aset(
+        self, key: str, value: Any, ttl: float | None = None, size: int | None = None,
+        stored_at: float | None = None,
+    ) -> None: ...
+
+
+class TTLCache:
+    """In-process LRU cache bounded by entry count and total bytes, with per-entry TTL.
+
+    Expired entries are dropped on read and by a periodic sweep run from `set`, so keys that are
+    never read again do not linger.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 1024,
+        max_bytes: int | None = None,
+        sweep_interval: float = 60.0,
+    ):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sweep_interval = sweep_interval
+        self._data: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get_entry(key, count=False) is not None
+
+    def get_entry(self, key: str, count: bool = True) -> CacheEntry | None:
+        entry = self._data.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            if count:
+                self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return entry
+
+    def get(self, key: str) -> Any | None:
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else None
+
+    def set(
+        self, key: str, value: Any, ttl: float | None = None, size: int | None = None,
+        stored_at: float | None = None,
+    ) -> None:
+        now = time.time() if stored_at is None else stored_at
+        if key in self._data:
+            self._remove(key)
+        entry = CacheEntry(
+            value=value,
+            stored_at=now,
+            expires_at=now + (self._ttl if ttl is None else ttl),
+            size=estimate_size(value) if size is None else size,
+        )
+        self._data[key] = entry
+        self._bytes += entry.size
+        self._evict()
+        if time.monotonic() - self._last_sweep >= self._sweep_interval:
+            self.sweep()
+
+    async def aget_entry(self, key: str, count: bool = True) -> CacheEntry | None:
+        return self.get_entry(key, count)
+
+    async def aset(
+        self, key: str, value: Any, ttl: float | None = None, size: int | None = None,
+        stored_at: float | None = None,
+    ) -> None:
+        self.set(key, value, ttl=ttl, size=size, stored_at=stored_at)
+
+    def delete(self, key: str) -> None:
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def sweep(self) -> int:
+        """Drop every expired entry; returns how many were removed."""
+        now = time.time()
+        expired = [k for k, e in self._data.items() if e.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        self._last_sweep = time.monotonic()
+        return len(expired)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self._max_entries,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self._max_entries
+            or (self._max_bytes is not None and self._bytes > self._max_bytes)
+        ):
+            _, entry = self._data.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+
+class SQLiteCacheBackend:
+    """Cache shared by every worker process on a host, stored in one SQLite file (WAL mode).
+
+    Entries are namespaced so several caches can share a file. Bounds are enforced by the
+    periodic sweep, which drops expired rows and then the oldest rows beyond the limits.
+
+    Queries block (up to the 5 s busy timeout while another worker writes), so `aget_entry` /
+    `aset` run them in a worker thread and the event loop keeps serving other requests.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        ttl: float,
+        max_entries: int = 1024,
+        max_bytes: int | None = None,
+        sweep_interval: float = 60.0,
+    ):
+        self._namespace = namespace
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, expires_at REAL NOT NULL, size INTEGER NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_cache_entries_stored ON cache_entries (namespace, stored_at)"
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_entry(self, key: str, count: bool = True) -> CacheEntry | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, expires_at, size FROM cache_entries"
+                " WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self._namespace, key, time.time()),
+            ).fetchone()
+        if row is None:
+            if count:
+                self.misses += 1
+            return None
+        if count:
+            self.hits += 1
+        return CacheEntry(value=json.loads(row[0]), stored_at=row[1], expires_at=row[2], size=row[3])
+
+    def get(self, key: str) -> Any | None:
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else None
+
+    def set(
+        self, key: str, value: Any, ttl: float | None = None, size: int | None = None,
+        stored_at: float | None = None,
+    ) -> None:
+        now = time.time() if stored_at is None else stored_at
+        payload = json.dumps(value, separators=(",", ":"), default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self._namespace, key, payload, now,
+                    now + (self._ttl if ttl is None else ttl),
+                    len(payload) if size is None else size,
+                ),
+            )
+        if time.monotonic() - self._last_sweep >= self._sweep_interval:
+            self.sweep()
+
+    async def aget_entry(self, key: str, count: bool = True) -> CacheEntry | None:
+        return await asyncio.to_thread(self.get_entry, key, count)
+
+    async def aset(
+        self, key: str, value: Any, ttl: float | None = None, size: int | None = None,
+        stored_at: float | None = None,
+    ) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl, size, stored_at)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self._namespace, key)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self._namespace,))
+
+    def sweep(self) -> int:
+        ns = self._namespace
+        with self._lock:
+            expired = self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (ns, time.time())
+            ).rowcount
+            evicted = self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache_entries WHERE namespace = ?"
+                " ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (ns, ns, self._max_entries),
+            ).rowcount
+            if self._max_bytes is not None:
+                evicted += self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                    " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY stored_at DESC) AS running"
+                    " FROM cache_entries WHERE namespace = ?) WHERE running > ?)",
+                    (ns, ns, self._max_bytes),
+                ).rowcount
+        self.expirations += expired
+        self.evictions += evicted
+        self._last_sweep = time.monotonic()
+        return expired
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+                (self._namespace,),
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "entries": entries,
+            "bytes": total,
+            "max_entries": self._max_entries,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def create_cache_backend(
+    namespace: str,
+    ttl: float,
+    max_entries: int = 1024,
+    max_bytes: int | None = None,
+    sweep_interval: float = 60.0,
+) -> CacheBackend:
+    """Build the backend selected by CACHE_BACKEND ("memory" per process, "sqlite" shared by workers)."""
+    if settings.CACHE_BACKEND == "sqlite":
+        return SQLiteCacheBackend(
+            settings.CACHE_SQLITE_PATH, namespace, ttl,
+            max_entries=max_entries, max_bytes=max_bytes, sweep_interval=sweep_interval,
+        )
+    return TTLCache(ttl, max_entries=max_entries, max_bytes=max_bytes, sweep_interval=sweep_interval)
+
+
+class KeyedLocks:
+    """Per-key asyncio locks for single-flight work; a key's lock is dropped when nobody holds or awaits it."""
+
+    def __init__(self):
+        self._locks: dict[str, tuple[asyncio.Lock, list[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        if key not in self._locks:
+            self._locks[key] = (asyncio.Lock(), [0])
+        lock, users = self._locks[key]
+        users[0] += 1
+        try:
+            async with lock:
+                yield
+        finally:
+            users[0] -= 1
+            if users[0] == 0:
+                del self._locks[key]
@@ -0,0 +1,105 @@
+"""Circuit breaker for upstream APIs: fail fast while an upstream is down, probe to recover."""
+
+import time
+from enum import Enum
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and rejects calls for `recovery_timeout`
+    seconds. It then goes half-open and lets up to `half_open_max_calls` probes through: one
+    success closes it again, a failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._last_probe_at = 0.0
+        self.rejected = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and time.monotonic() - self._opened_at >= self._recovery_timeout:
+            self._transition(CircuitState.HALF_OPEN)
+            self._probes_in_flight = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) must not wedge the circuit
+            if time.monotonic() - self._last_probe_at >= self._recovery_timeout:
+                self._probes_in_flight = 0
+            if self._probes_in_flight < self._half_open_max_calls:
+                self._probes_in_flight += 1
+                self._last_probe_at = time.monotonic()
+                return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        if self._state is not CircuitState.CLOSED:
+            self._transition(CircuitState.CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state is CircuitState.HALF_OPEN or self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
+            self._transition(CircuitState.OPEN)
+
+    def record_release(self) -> None:
+        """An outcome that says nothing about upstream health: free the probe slot, keep the state."""
+        if self._state is CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record_status(self, status_code: int) -> None:
+        """Record an HTTP response. 403 (blocked or out of quota), 429 and 5xx count as failures;
+        other 4xx mean the request itself was wrong and leave the circuit as it is."""
+        if status_code in (403, 429) or status_code >= 500:
+            self.record_failure()
+        elif status_code >= 400:
+            self.record_release()
+        else:
+            self.record_success()
+
+    def snapshot(self) -> dict:
+        state = self.state
+        retry_in = (
+            max(0.0, self._recovery_timeout - (time.monotonic() - self._opened_at))
+            if state is CircuitState.OPEN else 0.0
+        )
+        return {
+            "state": state.value,
+            "consecutive_failures": self._failures,
+            "rejected": self.rejected,
+            "retry_in_seconds": round(retry_in, 1),
+        }
+
+    def _transition(self, state: CircuitState) -> None:
+        if state is not self._state:
+            logger.warning("circuit_state_change", circuit=self.name, old=self._state.value, new=state.value)
+            self._state = state
@@ -0,0 +1,62 @@
+"""Precompressed response variants and Accept-Encoding negotiation."""
+
+import gzip
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip and identity are offered
+    brotli = None
+
+# Server preference when the client accepts several encodings equally
+_PREFERENCE = ("br", "gzip", "identity")
+
+
+def compress_variants(content: bytes) -> dict[str, bytes]:
+    """Identity plus every supported compressed form, computed once per cached payload.
+
+    Payloads under RESPONSE_COMPRESSION_MIN_BYTES are not worth the CPU or the header
+    overhead and only get the identity form.
+    """
+    variants = {"identity": content}
+    if len(content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+        return variants
+    variants["gzip"] = gzip.compress(content, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+    if brotli is not None:
+        variants["br"] = brotli.compress(content, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return variants
+
+
+def _parse_accept_encoding(header: str) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    return weights
+
+
+def negotiate_encoding(accept_encoding: str | None, available: dict[str, bytes]) -> str:
+    """Pick the content coding for a request: highest q-value, ties broken by _PREFERENCE."""
+    if not accept_encoding:
+        return "identity"
+    weights = _parse_accept_encoding(accept_encoding)
+    wildcard = weights.get("*")
+    best, best_q = "identity", 0.0
+    for encoding in _PREFERENCE:
+        if encoding not in available:
+            continue
+        q = weights.get(encoding, wildcard if wildcard is not None else (1.0 if encoding == "identity" else 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
@@ -0,0 +1,72 @@
+"""HTTP validators for cacheable GET responses: ETag / Last-Modified headers and 304 checks."""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+
+def make_etag(*parts: object) -> str:
+    """Strong ETag from the values that identify a representation's version."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def content_etag(content: bytes) -> str:
+    """Strong ETag from a representation's encoded bytes, so equal ETags mean equal bodies."""
+    return f'"{hashlib.sha1(content).hexdigest()[:20]}"'
+
+
+def variant_etag(etag: str, encoding: str, form: str | None = None) -> str:
+    """Each content coding (and each non-default media type `form`) is a different
+    representation, so it needs its own strong ETag."""
+    suffix = "".join(f"-{part.rsplit('/', 1)[-1]}" for part in (form, encoding) if part and part != "identity")
+    return f'{etag[:-1]}{suffix}"' if suffix else etag
+
+
+def base_etag(tag: str) -> str:
+    """The version ETag behind a client-supplied tag: drops W/ and any variant suffix."""
+    opaque = tag.strip().removeprefix("W/").strip('"')
+    return f'"{opaque.split("-", 1)[0]}"'
+
+
+def http_date(timestamp: float) -> str:
+    return format_datetime(datetime.fromtimestamp(int(timestamp), tz=timezone.utc), usegmt=True)
+
+
+def cache_headers(etag: str, last_modified: float, max_age: int, vary: str = "Accept-Encoding") -> dict[str, str]:
+    """Validator and freshness headers. The data is the same for every user, so shared caches may
+    store it even though the request carried credentials."""
+    return {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": f"public, max-age={max(0, max_age)}",
+        "Vary": vary,
+    }
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def is_not_modified(headers, etag: str, last_modified: float) -> bool:
+    """True when the request's validators show the client already has this representation.
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted without it.
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return int(last_modified) <= since.timestamp()
+    return False
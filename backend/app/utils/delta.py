@@ -0,0 +1,42 @@
+"""Row-level deltas between two versions of a JSON document with keyed series."""
+
+from collections.abc import Mapping
+
+
+def _keyed(rows: list, id_field: str) -> dict:
+    # Rows without their id field (projected away) fall back to their position
+    return {row.get(id_field, i) if isinstance(row, dict) else i: row for i, row in enumerate(rows)}
+
+
+def diff_rows(old: list, new: list, id_field: str) -> dict:
+    """Rows of `new` that are added or changed relative to `old`, and the ids of removed rows."""
+    before, after = _keyed(old, id_field), _keyed(new, id_field)
+    return {
+        "added": [row for key, row in after.items() if key not in before],
+        "changed": [row for key, row in after.items() if key in before and before[key] != row],
+        "removed": [key for key in before if key not in after],
+    }
+
+
+def diff_document(old: dict, new: dict, series: Mapping[str, str]) -> dict:
+    """Delta from `old` to `new`.
+
+    Each list named in `series` (name -> row id field) is diffed row by row; any other top-level
+    field whose value differs is sent whole under "set", and fields that disappeared are listed
+    under "unset". Applying the delta to `old` and keeping each series ordered by its id gives `new`.
+    """
+    delta: dict = {}
+    changed = {k: v for k, v in new.items() if k not in series and old.get(k) != v}
+    for name, id_field in series.items():
+        if name in new and isinstance(new[name], list) and isinstance(old.get(name), list):
+            rows = diff_rows(old[name], new[name], id_field)
+            if any(rows.values()):
+                delta[name] = rows
+        elif name in new and old.get(name) != new[name]:
+            changed[name] = new[name]
+    if changed:
+        delta["set"] = changed
+    unset = [k for k in old if k not in new]
+    if unset:
+        delta["unset"] = unset
+    return delta
@@ -0,0 +1,67 @@
+"""Forecast series helpers: daily aggregates derived from an hourly WeatherBit series."""
+
+from collections import Counter
+from itertools import groupby
+
+# Local hours whose condition decides a day's headline weather (and its daytime "d" icon)
+_DAYTIME_HOURS = range(6, 19)
+
+
+def _local_date(row: dict) -> str:
+    return (row.get("timestamp_local") or row.get("datetime") or "")[:10]
+
+
+def _local_hour(row: dict) -> int:
+    stamp = row.get("timestamp_local") or ""
+    return int(stamp[11:13]) if len(stamp) >= 13 and stamp[11:13].isdigit() else 12
+
+
+def _dominant_weather(rows: list[dict]) -> dict:
+    daytime = [r for r in rows if _local_hour(r) in _DAYTIME_HOURS] or rows
+    conditions = [r.get("weather") or {} for r in daytime]
+    counts = Counter(c.get("code", c.get("description")) for c in conditions)
+    top = counts.most_common(1)[0][0]
+    return next(c for c in conditions if c.get("code", c.get("description")) == top)
+
+
+def _mean(values: list[float]) -> float | None:
+    return round(sum(values) / len(values), 1) if values else None
+
+
+def daily_from_hourly(hourly_rows: list[dict], days: int) -> list[dict]:
+    """Aggregate hourly rows into WeatherBit-shaped daily rows, one per local date.
+
+    High/low come from hourly temperatures, humidity and wind are means, pop is the
+    daily maximum and the condition is the most frequent daytime one. Rows must be in
+    time order (as WeatherBit returns them); each date is handled in a single pass.
+
+    A series starting mid-day still yields today, aggregated over its remaining hours
+    (`hours` says how many). A last day cut off by the end of the series is dropped, since
+    its high/low would only cover the night.
+    """
+    groups = [(date, list(group)) for date, group in groupby(hourly_rows, key=_local_date) if date]
+    if len(groups) > 1 and _local_hour(groups[-1][1][-1]) < 23:
+        groups.pop()
+    daily = []
+    for date, rows in groups:
+        temps = [r["temp"] for r in rows if r.get("temp") is not None]
+        if not temps:
+            continue
+        pops = [r["pop"] for r in rows if r.get("pop") is not None]
+        high, low = max(temps), min(temps)
+        rh = _mean([r["rh"] for r in rows if r.get("rh") is not None])
+        daily.append({
+            "valid_date": date,
+            "high_temp": high,
+            "low_temp": low,
+            "max_temp": high,
+            "min_temp": low,
+            "rh": round(rh) if rh is not None else None,
+            "wind_spd": _mean([r["wind_spd"] for r in rows if r.get("wind_spd") is not None]),
+            "pop": max(pops) if pops else None,
+            "weather": _dominant_weather(rows),
+            "hours": len(rows),
+        })
+        if len(daily) == days:
+            break
+    return daily
@@ -0,0 +1,83 @@
+"""Coordinate helpers: spatial quantization of lat/lon for cache sharing."""
+
+from app.core.config import settings
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits, ch, even = 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def geohash_center(geohash: str) -> tuple[float, float]:
+    """Return the (lat, lon) centre of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _BASE32.index(c)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+def _wrap_lon(lon: float) -> float:
+    return ((lon + 180.0) % 360.0) - 180.0
+
+
+def snap_coordinates(lat: float, lon: float) -> tuple[float, float]:
+    """Snap a point to the centre of its cache cell (COORD_QUANTIZATION: grid, geohash or none)."""
+    mode = settings.COORD_QUANTIZATION
+    lat = max(-90.0, min(90.0, lat))
+    lon = _wrap_lon(lon)
+    if mode == "geohash":
+        return geohash_center(geohash_encode(lat, lon, settings.COORD_GEOHASH_PRECISION))
+    if mode == "grid":
+        step = settings.COORD_GRID_DEGREES
+        return max(-90.0, min(90.0, round(lat / step) * step)), _wrap_lon(round(lon / step) * step)
+    return lat, lon
+
+
+def format_coord(value: float) -> str:
+    """Canonical string form so 51.5, 51.50 and 51.500000001 produce the same cache key."""
+    text = f"{value:.6f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def coord_params(lat: float, lon: float) -> dict[str, str]:
+    """Quantized lat/lon query parameters for upstream calls and cache keys."""
+    qlat, qlon = snap_coordinates(lat, lon)
+    return {"lat": format_coord(qlat), "lon": format_coord(qlon)}
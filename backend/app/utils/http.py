@@ -0,0 +1,29 @@
+"""Shared factory for long-lived, connection-pooled upstream HTTP clients."""
+
+import importlib.util
+
+import httpx
+
+from app.core.config import settings
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_pooled_client(
+    *, headers: dict[str, str] | None = None, timeout: httpx.Timeout | float | None = None
+) -> httpx.AsyncClient:
+    """Build an AsyncClient meant to be created once and reused for the lifetime of the app."""
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout,
+        limits=limits,
+        http2=settings.HTTP2_ENABLED and http2_available(),
+    )
@@ -0,0 +1,77 @@
+"""Response media types: JSON plus binary MessagePack / CBOR encodings, picked by Accept."""
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # optional: without it MessagePack is not offered
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional: without it CBOR is not offered
+    cbor2 = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Names clients use for MessagePack before application/msgpack was registered
+_ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+
+
+def available_media_types() -> tuple[str, ...]:
+    offered = [JSON]
+    if msgpack is not None:
+        offered.append(MSGPACK)
+    if cbor2 is not None:
+        offered.append(CBOR)
+    return tuple(offered)
+
+
+def encode(payload: dict | list, media_type: str) -> bytes:
+    """Encode a JSON-compatible payload in a binary media type. Same schema as the JSON body."""
+    if media_type == MSGPACK and msgpack is not None:
+        return msgpack.packb(payload)
+    if media_type == CBOR and cbor2 is not None:
+        return cbor2.dumps(payload)
+    raise ValueError(f"Unsupported media type: {media_type}")
+
+
+def negotiate_media_type(accept: str | None, extra: tuple[str, ...] = ()) -> str:
+    """Pick the response media type for an Accept header: highest q-value among the offered
+    types, ties broken by the client's order. Wildcards, unknown types and a missing header all
+    mean JSON, so browsers and existing clients are unaffected. `extra` adds an endpoint's own
+    media types (such as a columnar JSON layout) to the offer."""
+    if not accept:
+        return JSON
+    offered = available_media_types() + extra
+    best, best_q = JSON, 0.0
+    for item in accept.split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        name = name.lower()
+        name = JSON if name in ("*/*", "application/*") else _ALIASES.get(name, name)
+        if name not in offered:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def negotiated(request: Request, body: BaseModel, status_code: int = 200) -> Response:
+    """Serialize a response model as JSON or the binary media type the client asked for."""
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    payload = body.model_dump(mode="json")
+    headers = {"Vary": "Accept"}
+    if media_type == JSON:
+        return JSONResponse(payload, status_code=status_code, headers=headers)
+    return Response(encode(payload, media_type), status_code=status_code, media_type=media_type, headers=headers)
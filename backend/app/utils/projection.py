@@ -0,0 +1,52 @@
+"""Field selectors (`?fields=temp,hourly.temp`) for trimming API responses."""
+
+from collections.abc import Collection, Mapping
+
+from app.core.exceptions import ValidationError
+
+# Parsed selector: top-level field -> selected sub-fields (None = the whole field)
+Selection = dict[str, tuple[str, ...] | None]
+
+
+def parse_fields(
+    spec: str,
+    schema: Mapping[str, Collection[str] | None],
+    default_parent: str | None = None,
+) -> Selection:
+    """Parse a comma-separated selector against the fields a response offers.
+
+    `schema` maps top-level names to their selectable sub-fields (None for scalars). With
+    `default_parent`, bare names that are not top-level fields are read as its children, so
+    `temp` means `data.temp` on the current-weather endpoint. Unknown names raise a 422.
+    """
+    selection: dict[str, set[str] | None] = {}
+    for raw in spec.split(","):
+        name = raw.strip()
+        if not name:
+            continue
+        parent, _, child = name.partition(".")
+        if not child and parent not in schema and default_parent is not None:
+            parent, child = default_parent, parent
+        if parent not in schema or (child and (schema[parent] is None or child not in schema[parent])):
+            raise ValidationError(detail=f"Unknown field '{name}'")
+        if not child or schema[parent] is None:
+            selection[parent] = None
+        elif parent not in selection or selection[parent] is not None:
+            selection.setdefault(parent, set()).add(child)
+    if not selection:
+        raise ValidationError(detail="fields must name at least one field")
+    # Keep the schema's field order so equal selections share one cache entry
+    ordered: Selection = {}
+    for parent, children in schema.items():
+        if parent in selection:
+            subs = selection[parent]
+            ordered[parent] = None if subs is None else tuple(f for f in children if f in subs)
+    return ordered
+
+
+def selection_key(selection: Selection) -> str:
+    """Canonical string form of a selection, for cache keys."""
+    return ",".join(
+        parent if subs is None else ",".join(f"{parent}.{f}" for f in subs)
+        for parent, subs in selection.items()
+    )
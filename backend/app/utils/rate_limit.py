@@ -0,0 +1,79 @@
+"""Async rate limiting primitives for upstream APIs."""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+
+class TokenBucket:
+    """Token bucket that paces request *starts* at `rate` per second with bursts up to `burst`.
+
+    Callers reserve a token synchronously (no await between check and update), so waiters are
+    served in arrival order and nothing is held while the actual request runs.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._rate = rate
+        self._capacity = float(max(1, burst))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    async def acquire(self, timeout: float | None = None) -> bool:
+        """Wait for a token. Returns False without consuming one if the wait would exceed `timeout`."""
+        self._refill()
+        wait = (1 - self._tokens) / self._rate if self._tokens < 1 else 0.0
+        if timeout is not None and wait > timeout:
+            return False
+        self._tokens -= 1
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._tokens += 1
+                raise
+        return True
+
+
+class UpstreamLimiter:
+    """Per-host limiter: token-bucket start rate plus a cap on concurrent in-flight requests."""
+
+    def __init__(self, rate: float, burst: int, max_in_flight: int):
+        self._bucket = TokenBucket(rate, burst)
+        self._in_flight = asyncio.Semaphore(max(1, max_in_flight))
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self, timeout: float | None = None) -> AsyncIterator[None]:
+        """Hold a request slot. Callers queue in arrival order; with `timeout`, TimeoutError is
+        raised if the slot is not granted within that many seconds (the request itself is not
+        bounded by it)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(self._in_flight.acquire(), timeout)
+            except TimeoutError:
+                raise TimeoutError("timed out waiting for an upstream request slot") from None
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                granted = await self._bucket.acquire(timeout=remaining)
+            except BaseException:
+                self._in_flight.release()
+                raise
+            if not granted:
+                self._in_flight.release()
+                raise TimeoutError("timed out waiting for an upstream request slot")
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self._in_flight.release()
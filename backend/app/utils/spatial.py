@@ -0,0 +1,109 @@
+"""Great-circle distance and a static k-d tree for nearest-place and radius queries."""
+
+import math
+from array import array
+from collections.abc import Iterable
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    p, l = math.radians(lat), math.radians(lon)
+    return math.cos(p) * math.cos(l), math.cos(p) * math.sin(l), math.sin(p)
+
+
+def _chord_sq(km: float) -> float:
+    """Squared straight-line distance on the unit sphere for a great-circle distance."""
+    return (2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)) ** 2
+
+
+def _km(chord_sq: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord_sq) / 2))
+
+
+class SpatialIndex:
+    """Points on the sphere as 3-D unit vectors in an implicit k-d tree.
+
+    Straight-line (chord) distance between unit vectors orders points exactly like great-circle
+    distance, so queries need no special cases at the antimeridian or the poles. The tree is
+    built once: `_order` holds point ids arranged so that each range's middle element splits it
+    on axis depth % 3. Query results are (point id, distance in km), ids in insertion order.
+    """
+
+    def __init__(self, points: Iterable[tuple[float, float]]):
+        xs, ys, zs = array("d"), array("d"), array("d")
+        for lat, lon in points:
+            x, y, z = _unit_vector(lat, lon)
+            xs.append(x)
+            ys.append(y)
+            zs.append(z)
+        self._axes = (xs, ys, zs)
+        self._order = array("l", range(len(xs)))
+        self._build(0, len(xs), 0)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def _build(self, lo: int, hi: int, depth: int) -> None:
+        if hi - lo <= 1:
+            return
+        coords = self._axes[depth % 3]
+        self._order[lo:hi] = array("l", sorted(self._order[lo:hi], key=coords.__getitem__))
+        mid = (lo + hi) // 2
+        self._build(lo, mid, depth + 1)
+        self._build(mid + 1, hi, depth + 1)
+
+    def nearest(self, lat: float, lon: float, max_km: float | None = None) -> tuple[int, float] | None:
+        """The closest point, or None if the index is empty or nothing lies within max_km."""
+        query = _unit_vector(lat, lon)
+        # [point id, squared chord]; ties go to the lowest id, so results don't depend on tree shape
+        best = [len(self._order), _chord_sq(max_km) if max_km is not None else math.inf]
+        self._nearest(query, 0, len(self._order), 0, best)
+        return (best[0], _km(best[1])) if best[0] < len(self._order) else None
+
+    def _nearest(self, query: tuple[float, float, float], lo: int, hi: int, depth: int, best: list) -> None:
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        point = self._order[mid]
+        xs, ys, zs = self._axes
+        d = (xs[point] - query[0]) ** 2 + (ys[point] - query[1]) ** 2 + (zs[point] - query[2]) ** 2
+        if d < best[1] or (d == best[1] and point < best[0]):
+            best[0], best[1] = point, d
+        axis = depth % 3
+        diff = query[axis] - self._axes[axis][point]
+        near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+        self._nearest(query, *near, depth + 1, best)
+        if diff * diff <= best[1]:
+            self._nearest(query, *far, depth + 1, best)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list[tuple[int, float]]:
+        """Every point within radius_km, nearest first."""
+        query = _unit_vector(lat, lon)
+        limit = _chord_sq(radius_km)
+        found: list[tuple[int, float]] = []
+        stack = [(0, len(self._order), 0)]
+        xs, ys, zs = self._axes
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            point = self._order[mid]
+            d = (xs[point] - query[0]) ** 2 + (ys[point] - query[1]) ** 2 + (zs[point] - query[2]) ** 2
+            if d <= limit:
+                found.append((point, d))
+            diff = query[depth % 3] - self._axes[depth % 3][point]
+            if diff <= 0 or diff * diff <= limit:
+                stack.append((lo, mid, depth + 1))
+            if diff >= 0 or diff * diff <= limit:
+                stack.append((mid + 1, hi, depth + 1))
+        found.sort(key=lambda item: item[1])
+        return [(point, _km(d)) for point, d in found]
@@ -0,0 +1,89 @@
+"""CPU cost of bursts of identical forecast requests with and without result coalescing.
+
+Usage (from backend/):
+    python -m benchmarks.bench_coalescing --requests 200 --cities 5 --bursts 20
+
+The WeatherBit client is replaced by an in-memory stub (cached payloads returned after a
+short await), so the numbers isolate what WeatherService itself spends per request:
+response assembly and Pydantic DTO construction.
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services import weather_service
+from app.services.mock_weather import (
+    CITY_DB,
+    generate_alerts,
+    generate_forecast_daily,
+    generate_forecast_hourly,
+)
+from app.services.weather_client import ResolvedLocation, UpstreamResult
+
+
+class _StubClient:
+    """Returns pre-generated payloads, like a WeatherBitClient whose cache is always warm."""
+
+    def __init__(self):
+        self.calls = 0
+        self._payloads: dict[tuple, dict] = {}
+        self._stored_at = time.time()
+
+    def _cached(self, key: tuple, generate) -> UpstreamResult:
+        self.calls += 1
+        if key not in self._payloads:
+            self._payloads[key] = generate()
+        return UpstreamResult(self._payloads[key], "live", self._stored_at)
+
+    async def resolve_location(self, city=None, lat=None, lon=None):
+        info = CITY_DB[city.lower()]
+        return ResolvedLocation({"lat": str(info["lat"]), "lon": str(info["lon"])})
+
+    async def get_forecast_daily(self, city=None, lat=None, lon=None, days=5, location=None):
+        await asyncio.sleep(0)
+        return self._cached(("daily", city, days), lambda: generate_forecast_daily(city=city, days=days))
+
+    async def get_forecast_hourly(self, city=None, lat=None, lon=None, hours=48, location=None):
+        await asyncio.sleep(0)
+        return self._cached(("hourly", city, hours), lambda: generate_forecast_hourly(city=city, hours=hours))
+
+    async def get_alerts(self, lat, lon):
+        return self._cached(("alerts", lat, lon), generate_alerts)
+
+
+async def _run(requests: int, cities: list[str], bursts: int) -> tuple[float, int]:
+    stub = _StubClient()
+    weather_service.weather_client = stub
+    service = weather_service.WeatherService()
+    cpu = 0.0
+    for _ in range(bursts):
+        weather_service._results.clear()
+        start = time.process_time()
+        await asyncio.gather(*(service.get_forecast(city=cities[i % len(cities)]) for i in range(requests)))
+        cpu += time.process_time() - start
+    return cpu / (bursts * requests), stub.calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="concurrent requests per burst")
+    parser.add_argument("--cities", type=int, default=5, help="distinct hot cities per burst")
+    parser.add_argument("--bursts", type=int, default=20)
+    args = parser.parse_args()
+
+    cities = [c.title() for c in list(CITY_DB)[: args.cities]]
+    original_client, original_memo = weather_service.weather_client, settings.WEATHER_RESULT_MEMO_SECONDS
+    try:
+        for label, memo in (("uncoalesced", 0.0), ("coalesced", original_memo or 2.0)):
+            settings.WEATHER_RESULT_MEMO_SECONDS = memo
+            per_request, calls = asyncio.run(_run(args.requests, cities, args.bursts))
+            print(f"{label:<12} cpu/request={per_request * 1e6:8.1f}us client calls={calls}")
+    finally:
+        weather_service.weather_client = original_client
+        settings.WEATHER_RESULT_MEMO_SECONDS = original_memo
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Payload size and build+encode time of the row vs columnar forecast formats.
+
+Usage (from backend/):
+    python -m benchmarks.bench_forecast_formats --hours 120 --iterations 500
+
+Builds each format from the same warm upstream payloads (stub client, no network) with the
+result cache disabled, so every iteration pays model construction / column assembly and
+JSON encoding. Sizes include the precompressed variants; timings exclude compression.
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services import weather_service
+from benchmarks.bench_coalescing import _StubClient
+
+
+async def _measure(columnar: bool, hours: int, iterations: int) -> tuple[float, dict[str, int]]:
+    service = weather_service.WeatherService()
+    result = await service.get_forecast_result(city="London", hours=hours, columnar=columnar)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await service.get_forecast_result(city="London", hours=hours, columnar=columnar)
+    elapsed = (time.perf_counter() - start) / iterations
+    return elapsed, {k: len(v) for k, v in result.variants.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=int, default=48)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    original = (
+        weather_service.weather_client, settings.WEATHER_RESULT_MEMO_SECONDS, settings.RESPONSE_COMPRESSION_MIN_BYTES
+    )
+    weather_service.weather_client = _StubClient()
+    settings.WEATHER_RESULT_MEMO_SECONDS = 0
+    try:
+        for label, columnar in (("rows", False), ("columnar", True)):
+            _, sizes = asyncio.run(_measure(columnar, args.hours, 1))
+            settings.RESPONSE_COMPRESSION_MIN_BYTES = 1 << 30  # time assembly + encoding only
+            elapsed, _ = asyncio.run(_measure(columnar, args.hours, args.iterations))
+            settings.RESPONSE_COMPRESSION_MIN_BYTES = original[2]
+            sizes_text = " ".join(f"{k}={v}B" for k, v in sizes.items())
+            print(f"{label:<9} build+encode={elapsed * 1e6:8.1f}us {sizes_text}")
+    finally:
+        weather_service.weather_client, settings.WEATHER_RESULT_MEMO_SECONDS, settings.RESPONSE_COMPRESSION_MIN_BYTES = original
+
+
+if __name__ == "__main__":
+    main()
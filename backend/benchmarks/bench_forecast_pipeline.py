@@ -0,0 +1,68 @@
+"""Cold-path forecast latency: per-call geocoding with trailing alerts vs the resolve-once planner.
+
+Usage (from backend/):
+    python -m benchmarks.bench_forecast_pipeline --geocode-ms 120 --upstream-ms 180
+
+Geocoding and WeatherBit round trips are simulated with fixed sleeps (no network), so the
+result shows how many of them sit on the critical path of one uncached forecast.
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.services import geocoding, weather_service
+from app.services.weather_client import WeatherBitClient
+
+
+def _stub(client: WeatherBitClient, geocode_s: float, upstream_s: float) -> None:
+    async def validate_city(city):
+        await asyncio.sleep(geocode_s)
+        return {"city": city.title(), "country": "GB", "lat": 51.5, "lon": -0.12}
+
+    async def request(endpoint, params, max_age=None):
+        await asyncio.sleep(upstream_s)
+        return {"city_name": "", "lat": 51.5, "lon": -0.12, "data": [], "alerts": []}, False, time.time()
+
+    geocoding.validate_city = validate_city
+    client._request = request
+
+
+async def _unplanned(client: WeatherBitClient, city: str) -> None:
+    """The previous pipeline: each forecast call geocodes on its own, alerts start afterwards."""
+    daily, _ = await asyncio.gather(
+        client.get_forecast_daily(city=city, days=5),
+        client.get_forecast_hourly(city=city, hours=48),
+    )
+    await client.get_alerts(lat=daily.data["lat"], lon=daily.data["lon"])
+
+
+async def _run(geocode_s: float, upstream_s: float) -> None:
+    client = WeatherBitClient()
+    _stub(client, geocode_s, upstream_s)
+    weather_service.weather_client = client
+    weather_service._results.clear()
+
+    start = time.perf_counter()
+    await _unplanned(client, "London")
+    unplanned = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await weather_service.WeatherService().get_forecast(city="London")
+    planned = time.perf_counter() - start
+
+    print(f"geocode={geocode_s * 1000:.0f}ms upstream={upstream_s * 1000:.0f}ms")
+    print(f"unplanned  {unplanned * 1000:7.1f}ms")
+    print(f"planned    {planned * 1000:7.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--geocode-ms", type=float, default=120.0)
+    parser.add_argument("--upstream-ms", type=float, default=180.0)
+    args = parser.parse_args()
+    asyncio.run(_run(args.geocode_ms / 1000, args.upstream_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
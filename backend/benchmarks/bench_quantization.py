@@ -0,0 +1,66 @@
+"""Upstream-call hit rate for jittered coordinates with and without spatial quantization.
+
+Usage (from backend/):
+    python -m benchmarks.bench_quantization --queries 20000 --jitter-km 1.5
+
+Simulates browser geolocation fixes (six decimals, gaussian jitter around a set of urban
+centres) arriving within one cache TTL and counts how many distinct upstream cache keys
+each quantization mode produces.
+"""
+
+import argparse
+import random
+
+from app.core.config import settings
+from app.services.mock_weather import CITY_DB
+from app.utils.geo import coord_params
+
+KM_PER_DEGREE = 111.0
+
+
+def _workload(n: int, jitter_km: float, seed: int) -> list[tuple[float, float]]:
+    rng = random.Random(seed)
+    centres = [(c["lat"], c["lon"]) for c in CITY_DB.values()]
+    sigma = jitter_km / KM_PER_DEGREE
+    return [
+        (round(lat + rng.gauss(0, sigma), 6), round(lon + rng.gauss(0, sigma), 6))
+        for lat, lon in (rng.choice(centres) for _ in range(n))
+    ]
+
+
+def _hit_rate(points: list[tuple[float, float]], mode: str) -> tuple[int, float]:
+    settings.COORD_QUANTIZATION = mode
+    keys = set()
+    hits = 0
+    for lat, lon in points:
+        params = coord_params(lat, lon)
+        key = (params["lat"], params["lon"])
+        if key in keys:
+            hits += 1
+        keys.add(key)
+    return len(keys), hits / len(points)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--jitter-km", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    points = _workload(args.queries, args.jitter_km, args.seed)
+    original = settings.COORD_QUANTIZATION
+    try:
+        for mode, detail in (
+            ("none", "raw coordinates"),
+            ("grid", f"{settings.COORD_GRID_DEGREES} deg grid"),
+            ("geohash", f"geohash precision {settings.COORD_GEOHASH_PRECISION}"),
+        ):
+            upstream_calls, hit_rate = _hit_rate(points, mode)
+            print(f"{mode:<8} ({detail:<20}) upstream calls={upstream_calls:6d} hit rate={hit_rate:6.1%}")
+    finally:
+        settings.COORD_QUANTIZATION = original
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Hit-path throughput of /weather/forecast: DTO rebuild + response_model vs cached encoded bytes.
+
+Usage (from backend/):
+    python -m benchmarks.bench_response_cache --requests 2000
+
+Requests go through the full ASGI app in-process (routing, JWT auth dependency) with the
+WeatherBit client replaced by an in-memory stub, so every request is an upstream cache hit.
+The baseline route reproduces the previous endpoint: build the DTOs on every request and let
+FastAPI validate and JSON-encode them through response_model.
+"""
+
+import argparse
+import asyncio
+import time
+
+from httpx import ASGITransport, AsyncClient
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.main import create_app
+from app.schemas.weather import ForecastResponse
+from app.services import weather_service
+from benchmarks.bench_coalescing import _StubClient
+
+
+def _app():
+    app = create_app()
+
+    @app.get("/baseline/forecast", response_model=ForecastResponse)
+    async def baseline_forecast(city: str):
+        memo = settings.WEATHER_RESULT_MEMO_SECONDS
+        settings.WEATHER_RESULT_MEMO_SECONDS = 0
+        try:
+            return await weather_service.WeatherService().get_forecast(city=city)
+        finally:
+            settings.WEATHER_RESULT_MEMO_SECONDS = memo
+
+    return app
+
+
+async def _throughput(client: AsyncClient, path: str, requests: int, headers: dict) -> float:
+    await client.get(path, params={"city": "London"}, headers=headers)  # warm
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path, params={"city": "London"}, headers=headers)
+        assert response.status_code == 200, response.text
+    return requests / (time.perf_counter() - start)
+
+
+async def _run(requests: int) -> None:
+    original = weather_service.weather_client
+    weather_service.weather_client = _StubClient()
+    headers = {"Authorization": f"Bearer {create_access_token(subject='bench', extra_claims={'role': 'USER'})}"}
+    try:
+        async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://bench") as client:
+            before = await _throughput(client, "/baseline/forecast", requests, headers)
+            after = await _throughput(client, "/api/v1/weather/forecast", requests, headers)
+    finally:
+        weather_service.weather_client = original
+    print(f"rebuild + response_model  {before:8.0f} req/s")
+    print(f"cached encoded bytes      {after:8.0f} req/s  ({after / before:.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Compare per-request AsyncClient vs. the shared pooled client against a local TLS stub upstream.
+
+Usage (from backend/):
+    python -m benchmarks.bench_upstream_pool --requests 300 --rtt-ms 20
+
+The stub terminates real TLS, then delays each new connection by two RTTs (TCP + TLS
+handshake) and every request by one RTT, so the numbers approximate a remote upstream
+rather than loopback.
+"""
+
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import os
+import ssl
+import statistics
+import tempfile
+import time
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+BODY = b'{"data":[{"temp":12.5,"city_name":"Stub"}]}'
+
+
+def _write_self_signed_cert(directory: str) -> tuple[str, str]:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(
+            x509.SubjectAlternativeName([
+                x509.DNSName("localhost"),
+                x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+            ]),
+            critical=False,
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    return cert_path, key_path
+
+
+async def _start_stub(ssl_ctx: ssl.SSLContext, rtt: float) -> tuple[asyncio.AbstractServer, int]:
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Real TLS runs over loopback; charge the handshake's network round trips up front.
+        await asyncio.sleep(rtt * 2)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                if not head:
+                    break
+                await asyncio.sleep(rtt)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, ssl=ssl_ctx)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def _summary(label: str, samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (
+        f"{label:<22} p50={statistics.median(ordered) * 1000:7.2f}ms "
+        f"p99={p99 * 1000:7.2f}ms mean={statistics.fmean(ordered) * 1000:7.2f}ms"
+    )
+
+
+async def _run(n: int, rtt: float) -> None:
+    from app.utils.http import create_pooled_client
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_path, key_path = _write_self_signed_cert(tmp)
+        os.environ["SSL_CERT_FILE"] = cert_path  # trusted by httpx via trust_env
+        server_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_ctx.load_cert_chain(cert_path, key_path)
+        server, port = await _start_stub(server_ctx, rtt)
+        url = f"https://127.0.0.1:{port}/current"
+
+        per_request: list[float] = []
+        for i in range(n):
+            start = time.perf_counter()
+            async with httpx.AsyncClient(timeout=5) as client:
+                (await client.get(url, params={"i": i})).raise_for_status()
+            per_request.append(time.perf_counter() - start)
+
+        pooled: list[float] = []
+        client = create_pooled_client(timeout=httpx.Timeout(5))
+        try:
+            for i in range(n):
+                start = time.perf_counter()
+                (await client.get(url, params={"i": i})).raise_for_status()
+                pooled.append(time.perf_counter() - start)
+        finally:
+            await client.aclose()
+            server.close()
+            await server.wait_closed()
+
+    print(_summary("new client per fetch", per_request))
+    print(_summary("shared pooled client", pooled))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(_run(args.requests, args.rtt_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Accuracy of daily rows derived from hourly data against WeatherBit's /forecast/daily.
+
+Usage (from backend/, after running with UPSTREAM_MODE=record and FORECAST_DAILY_FROM_HOURLY=false
+so both endpoints are captured):
+    python -m benchmarks.compare_daily_from_hourly --archive upstream_archive
+
+Pairs recorded /forecast/daily and /forecast/hourly responses for the same location, runs
+the hourly series through daily_from_hourly() and reports per-field error over every local
+date both cover. Today is usually partial in the hourly series, so it is reported separately.
+"""
+
+import argparse
+import json
+from collections import defaultdict
+
+from app.services.upstream_archive import UpstreamArchive
+from app.utils.forecast import daily_from_hourly
+
+
+def _pairs(archive: UpstreamArchive):
+    by_location: dict[tuple[str, str], dict[str, dict]] = defaultdict(dict)
+    for record in archive.iter_records("weatherbit"):
+        if record["status_code"] != 200 or record["endpoint"] not in ("/forecast/daily", "/forecast/hourly"):
+            continue
+        params = record["params"]
+        by_location[(params.get("lat", ""), params.get("lon", ""))][record["endpoint"]] = json.loads(record["body"])
+    for location, bodies in sorted(by_location.items()):
+        if len(bodies) == 2:
+            yield location, bodies["/forecast/daily"], bodies["/forecast/hourly"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--archive", default="upstream_archive")
+    args = parser.parse_args()
+
+    errors: dict[str, dict[str, list[float]]] = {"full": defaultdict(list), "partial": defaultdict(list)}
+    locations = 0
+    for _, daily, hourly in _pairs(UpstreamArchive(args.archive)):
+        locations += 1
+        actual = {row["valid_date"]: row for row in daily.get("data", [])}
+        for derived in daily_from_hourly(hourly.get("data", []), days=len(actual)):
+            real = actual.get(derived["valid_date"])
+            if real is None:
+                continue
+            bucket = errors["full" if derived["hours"] == 24 else "partial"]
+            for field, real_field in (
+                ("high_temp", "max_temp"), ("low_temp", "min_temp"), ("rh", "rh"), ("wind_spd", "wind_spd"), ("pop", "pop"),
+            ):
+                if derived[field] is not None and real.get(real_field) is not None:
+                    bucket[field].append(abs(derived[field] - real[real_field]))
+            bucket["condition"].append(
+                0.0 if derived["weather"].get("code") == real.get("weather", {}).get("code") else 1.0
+            )
+
+    print(f"locations with both endpoints recorded: {locations}")
+    for kind, fields in errors.items():
+        if not fields:
+            continue
+        print(f"{kind} days ({len(fields['condition'])})")
+        for field, values in fields.items():
+            label = "mismatch rate" if field == "condition" else "mean abs error"
+            print(f"  {field:<10} {label:<15} {sum(values) / len(values):7.2f}  max {max(values):6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ function DataSourceBadge({ source }: { source: string }) {
   if (role !== "ADMIN") return null;
 
   const isLive = source === "live";
+  const label = isLive ? "LIVE API" : source === "stale" ? "STALE DATA" : "MOCK DATA";
   return (
     <span
       className={`inline-flex items-center gap-1 rounded-full px-2.5 py-0.5 text-xs font-medium ${
@@ -26,7 +27,7 @@ function DataSourceBadge({ source }: { source: string }) {
       <span
         className={`h-1.5 w-1.5 rounded-full ${isLive ? "bg-green-500" : "bg-amber-500"}`}
       />
-      {isLive ? "LIVE API" : "MOCK DATA"}
+      {label}
     </span>
   );
 }